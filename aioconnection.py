@@ -0,0 +1,265 @@
+"""Asyncio transport: many modules served from one event loop, no thread per port.
+
+The serial fd is non-blocking and watched with ``loop.add_reader``; received
+bytes go straight into a FrameDecoder and complete the future of the request
+in flight. Every request has its own deadline and can be cancelled::
+
+    async with AsyncConnection("/dev/ttyUSB0") as conn:
+        await conn.ping()
+        data = await conn.read_registers(0x00, 20, timeout=0.2)
+
+Needs an event loop with add_reader (the default loop on Linux/macOS).
+"""
+import asyncio
+import os
+import time
+
+import serial
+
+from client import build_empty_read_frame, build_registers_read_frame, build_registers_write_frame, plan_register_reads
+from connection import BAUDRATE, RESPONSE_TIMEOUT_NS, SLEEP_TIMEOUT
+from measurement import POLL_ADDRESS, POLL_LENGTH
+from metrics import METRICS
+from protocol import (
+    ACK,
+    NACK,
+    READY,
+    FRAME_ADDR_LSB_POS,
+    FRAME_DATA_POS,
+    FRAME_LEN_LSB_POS,
+    FRAME_LEN_MSB_POS,
+    FRAME_OP_POS,
+    OPERATION_READ,
+    OPERATION_WRITE,
+    FrameDecoder,
+    process_frame,
+)
+from registers import REGISTERS_PAGE_SIZE
+
+RESPONSE_TIMEOUT = RESPONSE_TIMEOUT_NS / 1e9
+
+
+class AsyncConnection:
+    """Coroutine counterpart of connection.Connection for one serial port.
+
+    Requests on one port are serialized (the bus is half duplex); requests on
+    different ports run concurrently. ``timeout`` bounds each request unless a
+    call passes its own. A request that times out or is cancelled leaves no
+    state behind: late bytes of its response are dropped before the next one,
+    and a read ACK that arrives later still is recognized by its ADDR/LEN echo
+    and counted as "stale" instead of answering the next read.
+    Awake tracking, the READY/timeout retry (reads only after a timeout) and
+    error counts work as in Connection.
+    """
+
+    def __init__(self, port, baudrate=BAUDRATE, *, timeout=RESPONSE_TIMEOUT, sleep_timeout=SLEEP_TIMEOUT,
+                 metrics=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.sleep_timeout = sleep_timeout
+        self.transactions = 0
+        self.wake_pings = 0
+        self.pings_skipped = 0
+        self.rewakes = 0
+        self.metrics = METRICS if metrics is None else metrics
+        self.errors = self.metrics.errors(port)
+        self._response_time = self.metrics.phase(port, "response")
+        self._ser = None
+        self._fd = None
+        self._loop = None
+        self._lock = None
+        self._decoder = None
+        self._response = None
+        self._expected = None  # ADDR/LEN bytes the read ACK in flight must echo
+        self._awake_until_ns = 0
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def is_open(self):
+        return self._ser is not None
+
+    @property
+    def awake(self):
+        return time.perf_counter_ns() < self._awake_until_ns
+
+    async def open(self):
+        if self._ser is None:
+            self._loop = asyncio.get_running_loop()
+            self._ser = serial.serial_for_url(self.port, self.baudrate, timeout=0)
+            self._fd = self._ser.fileno()
+            os.set_blocking(self._fd, False)
+            self._loop.add_reader(self._fd, self._on_readable)
+
+    def close(self):
+        ser, self._ser = self._ser, None
+        self._awake_until_ns = 0
+        if ser is None:
+            return
+        self._loop.remove_reader(self._fd)
+        self._fail(serial.SerialException(f"{self.port} closed"))
+        try:
+            ser.close()
+        except (serial.SerialException, OSError):
+            pass
+
+    # ------------------ Event loop side --------------------
+    def _fail(self, exc):
+        if self._response is not None and not self._response.done():
+            self._response.set_exception(exc)
+
+    def _on_readable(self):
+        try:
+            chunk = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.errors["serial"] += 1
+            self._fail(serial.SerialException(e))
+            self.close()
+            return
+        response, decoder = self._response, self._decoder
+        if response is None or response.done() or decoder is None:
+            return  # nobody is waiting (e.g. the request was cancelled)
+        for frame in decoder.feed(chunk):
+            if self._expected is not None and frame[FRAME_OP_POS] == ACK \
+                    and frame[FRAME_ADDR_LSB_POS:FRAME_DATA_POS] != self._expected:
+                # Late answer to an earlier, timed out or cancelled read
+                self.errors["stale"] += 1
+                continue
+            response.set_result(frame)
+            break
+
+    # ------------------ Requests --------------------
+    async def _exchange(self, frame, operation, timeout):
+        """Send ``frame`` and return the response frame, or None on timeout."""
+        if self._lock is None:
+            # Created once: requests still waiting for it across a close/reopen
+            # keep taking turns with the new ones
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await self.open()
+            self._decoder = FrameDecoder(operation)
+            self._response = self._loop.create_future()
+            self._expected = bytes(frame[FRAME_ADDR_LSB_POS:FRAME_DATA_POS]) if operation == OPERATION_READ else None
+            try:
+                # Drop anything left over from a timed out or cancelled request
+                self._ser.reset_input_buffer()
+                self.transactions += 1
+                written = time.perf_counter_ns()
+                self._ser.write(frame)
+                response = await asyncio.wait_for(self._response, self.timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                self._awake_until_ns = 0
+                self.errors["timeout"] += 1
+                return None
+            except (serial.SerialException, OSError) as e:
+                self.errors["serial"] += 1
+                self.close()
+                raise serial.SerialException(e)
+            finally:
+                if self._decoder is not None and self._decoder.bad_etx:
+                    self.errors["bad_etx"] += self._decoder.bad_etx
+                self._decoder = None
+                self._response = None
+            self._awake_until_ns = written + int(self.sleep_timeout * 1e9)
+            self._response_time.record(time.perf_counter_ns() - written)
+            return response
+
+    async def ping(self, force=False, timeout=None):
+        """Wake the module unless it is known to be awake (or ``force``). Return False on failure."""
+        if not force and self.awake:
+            self.pings_skipped += 1
+            return True
+        self.wake_pings += 1
+        try:
+            frame = await self._exchange(build_empty_read_frame(), None, timeout)
+        except serial.SerialException:
+            return False
+        if frame is None:
+            return False
+        if frame[FRAME_OP_POS] == NACK:
+            self.errors["nack"] += 1
+            return False
+        return True
+
+    async def send_frame(self, frame, operation, timeout=None):
+        """Return (status, response frame); asleep modules, and silent ones on reads, are woken and retried once."""
+        empty_read = operation == OPERATION_READ and not (frame[FRAME_LEN_LSB_POS] | frame[FRAME_LEN_MSB_POS])
+        try:
+            for attempt in range(2):
+                response = await self._exchange(frame, operation, timeout)
+                if response is None:
+                    # A write may have been executed with only its ACK lost: never resend it
+                    retry = (attempt == 0 and operation == OPERATION_READ
+                             and await self.ping(force=True, timeout=timeout))
+                elif response[FRAME_OP_POS] == NACK:
+                    self.errors["nack"] += 1
+                    return False, response
+                elif response[FRAME_OP_POS] == READY and not empty_read:
+                    # The module was asleep and only woke up
+                    retry = attempt == 0
+                else:
+                    return response[FRAME_OP_POS] in (ACK, READY), response
+                if not retry:
+                    return False, response or b""
+                self.rewakes += 1
+        except serial.SerialException:
+            return False, b""
+
+    async def read_registers(self, address=0x0000, length=REGISTERS_PAGE_SIZE, timeout=None):
+        """Return the register payload read from ``address`` or None on failure."""
+        status, frame = await self.send_frame(build_registers_read_frame(address, length), OPERATION_READ, timeout)
+        if not status:
+            return None
+        payload = process_frame(frame)
+        if payload is None:
+            self.errors["crc"] += 1
+        elif len(payload) < length:
+            self.errors["short_page"] += 1
+        return payload
+
+    async def write_registers(self, address, data, timeout=None):
+        status, _ = await self.send_frame(build_registers_write_frame(address, data), OPERATION_WRITE, timeout)
+        return status
+
+    def stats(self):
+        return {
+            "transactions": self.transactions,
+            "wake_pings": self.wake_pings,
+            "pings_skipped": self.pings_skipped,
+            "rewakes": self.rewakes,
+            "errors": dict(self.errors),
+        }
+
+
+async def run_measurement(conn, module, control_bit, *, deadline=2.0, min_poll=0.002, max_poll=0.05, fields=None):
+    """Trigger ``control_bit``, poll until the module clears it and read ``fields`` into ``module``."""
+    module.control = control_bit
+    addr, data = module.serialize_control()
+    if not await conn.write_registers(addr, data):
+        return False
+    end = time.monotonic() + deadline
+    interval = min_poll
+    while True:
+        await asyncio.sleep(interval)
+        data = await conn.read_registers(POLL_ADDRESS, POLL_LENGTH)
+        if data is not None and len(data) >= POLL_LENGTH:
+            module.deserialize_range(POLL_ADDRESS, data)
+            if not module.control & control_bit:
+                break
+        if time.monotonic() + interval > end:
+            return False
+        interval = min(interval * 2, max_poll)
+    for address, length in plan_register_reads(fields):
+        data = await conn.read_registers(address, length)
+        if data is None or len(data) < length:
+            return False
+        module.deserialize_range(address, data)
+    return True
@@ -0,0 +1,458 @@
+"""Streaming analytics over the daily CSV logs (logs/YYYY-MM-DD.csv).
+
+Logs are read in chunks of a few MB and parsed into NumPy record arrays, so
+memory stays bounded however long the time range is. Each file gets a sparse
+timestamp index (byte offset of every INDEX_STRIDE-th row), so a time-range
+query seeks to the first relevant block instead of parsing the day from the
+top. Aggregates of days that are over are cached on disk and reused::
+
+    stats = LogAnalytics("logs")
+    stats.summary(datetime(2026, 9, 1), datetime(2026, 10, 1))
+    stats.downsample(datetime(2026, 9, 1), datetime(2026, 10, 1), interval=3600, field="concentration")
+
+Needs numpy. Rows of one file are assumed to be in time order, as written by
+CsvLogger and log_module. Compressed logs (the per-run segments
+YYYY-MM-DD-N.csv.gz / .csv.zst) are streamed too, but without an index: a range
+query decompresses them from the top. A segment cut short by a crash is read
+up to where it breaks; the rows after that point are lost, the query goes on.
+"""
+import bisect
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from logger import COMPRESSION_SUFFIX, zstandard
+
+ROW_DTYPE = np.dtype([
+    ("timestamp", "datetime64[s]"),
+    ("module_id", "<u4"),
+    ("status", "u1"),
+    ("control", "u1"),
+    ("concentration", "<f4"),
+    ("temperature", "<f4"),
+    ("humidity", "<f4"),
+])
+FIELDS = ("concentration", "temperature", "humidity")
+# Bin width of the value histograms behind the percentiles (error <= half a bin)
+RESOLUTION = {"concentration": 0.001, "temperature": 0.01, "humidity": 0.01}
+PERCENTILES = (50, 90, 99)
+INDEX_STRIDE = 4096
+CHUNK_BYTES = 4 << 20
+
+_LOG_COLUMNS = 9
+_HEX = {f"0x{i:02X}".encode(): i for i in range(256)}
+_NEWLINE = ord("\n")
+# Raised when a compressed segment ends mid-stream (writer killed before close)
+_TRUNCATED = (EOFError,) if zstandard is None else (EOFError, zstandard.ZstdError)
+
+
+def _seconds(ts):
+    return int(np.datetime64(ts, "s").astype(np.int64))
+
+
+def parse_rows(lines):
+    """Parse CSV log lines (bytes, header and malformed lines skipped) into a ROW_DTYPE array."""
+    rows = [line.split(b",") for line in lines]
+    rows = [r for r in rows if len(r) == _LOG_COLUMNS and r[0] != b"timestamp"]
+    out = np.empty(len(rows), ROW_DTYPE)
+    if not rows:
+        return out
+    cols = list(zip(*rows))
+    out["timestamp"] = np.array(cols[0]).astype("datetime64[s]")
+    out["module_id"] = np.array(cols[1]).astype(np.uint32)
+    out["status"] = [_HEX.get(v, 0) for v in cols[4]]
+    out["control"] = [_HEX.get(v, 0) for v in cols[5]]
+    for i, name in enumerate(FIELDS, start=6):
+        out[name] = np.array(cols[i]).astype(np.float32)
+    return out
+
+
+class FileIndex:
+    """Byte offset and timestamp (epoch seconds) of every INDEX_STRIDE-th line of one log file.
+
+    ``update()`` only scans what was appended since the last call, so the
+    index of today's file stays current cheaply.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offsets = []
+        self.times = []
+        self.lines = 0
+        self.indexed_bytes = 0
+
+    def update(self):
+        size = self.path.stat().st_size
+        if size < self.indexed_bytes:
+            # File was replaced: start over
+            self.__init__(self.path)
+        if size == self.indexed_bytes:
+            return self
+        with self.path.open("rb") as f:
+            f.seek(self.indexed_bytes)
+            base = self.indexed_bytes
+            while True:
+                block = f.read(CHUNK_BYTES)
+                if not block:
+                    break
+                ends = np.flatnonzero(np.frombuffer(block, np.uint8) == _NEWLINE)
+                if not len(ends):
+                    break
+                starts = np.concatenate(([0], ends[:-1] + 1))
+                first = (-self.lines) % INDEX_STRIDE
+                for start in starts[first::INDEX_STRIDE]:
+                    start = int(start)
+                    head = block[start:start + 19]
+                    try:
+                        t = _seconds(head.decode())
+                    except ValueError:
+                        t = self.times[-1] if self.times else -1  # header line
+                    self.offsets.append(base + start)
+                    self.times.append(t)
+                self.lines += len(ends)
+                consumed = int(ends[-1]) + 1
+                base += consumed
+                if consumed < len(block):
+                    f.seek(base)
+            self.indexed_bytes = base
+        return self
+
+    def offset_for(self, t):
+        """Offset of the last indexed line before epoch second ``t`` (0 if none).
+
+        Strictly before: rows of second ``t`` may come just ahead of an indexed line of ``t``.
+        """
+        i = bisect.bisect_left(self.times, t) - 1
+        return self.offsets[i] if i >= 0 else 0
+
+
+def _compressed(path):
+    return not str(path).endswith(".csv")
+
+
+def _open_read(path):
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ValueError(f"{path}: reading zstd logs needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+    return open(path, "rb")
+
+
+def _read_block(f, size):
+    """Up to ``size`` bytes of ``f``, ending early (b"" at the end) where a compressed segment breaks off."""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        try:
+            part = f.read1(remaining)
+        except _TRUNCATED:
+            break
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
+
+def iter_log_lines(path, chunk_bytes=CHUNK_BYTES):
+    """Yield the complete lines (bytes, without newline) of a plain or compressed log, up to where it breaks off."""
+    with _open_read(path) as f:
+        tail = b""
+        while True:
+            block = _read_block(f, chunk_bytes)
+            if not block:
+                break
+            lines = (tail + block).split(b"\n")
+            tail = lines.pop()
+            yield from lines
+
+
+def _last_line_seconds(block):
+    """Epoch second of the last complete line of ``block`` (ending in a newline), None if unparsable."""
+    start = block.rfind(b"\n", 0, len(block) - 1) + 1
+    try:
+        return _seconds(block[start:start + 19].decode())
+    except ValueError:
+        return None
+
+
+def iter_file_chunks(path, start=None, end=None, index=None, chunk_bytes=CHUNK_BYTES):
+    """Yield ROW_DTYPE arrays of the rows of ``path`` with ``start <= timestamp < end``.
+
+    With a FileIndex of ``path`` (LogAnalytics keeps one per file) reading
+    starts at the indexed block before ``start``. Without one the file is
+    scanned from the top, skipping the parse of blocks that end before ``start``.
+    """
+    t_start = None if start is None else _seconds(start)
+    t_end = None if end is None else _seconds(end)
+    offset = 0
+    if t_start is not None and index is not None and not _compressed(path):
+        offset = index.update().offset_for(t_start)
+    with _open_read(path) as f:
+        if offset:
+            f.seek(offset)
+        tail = b""
+        while True:
+            block = _read_block(f, chunk_bytes)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            block, tail = block[:cut], block[cut:]
+            if t_start is not None and cut:
+                last = _last_line_seconds(block)
+                if last is not None and last < t_start:
+                    continue
+            rows = parse_rows(block.split(b"\n"))
+            if not len(rows):
+                continue
+            seconds = rows["timestamp"].astype(np.int64)
+            mask = np.ones(len(rows), bool)
+            if t_start is not None:
+                mask &= seconds >= t_start
+            if t_end is not None:
+                mask &= seconds < t_end
+            if mask.any():
+                yield rows[mask]
+            if t_end is not None and seconds[-1] >= t_end:
+                break
+
+
+def day_files(logs_dir, start=None, end=None):
+    """(date, path) of the daily logs and compressed segments overlapping [start, end), oldest first."""
+    files = []
+    suffixes = set(COMPRESSION_SUFFIX.values())
+    for path in Path(logs_dir).glob("????-??-??*.csv*"):
+        name, _, suffix = path.name.partition(".")
+        segment = name[11:]  # N of YYYY-MM-DD-N, empty for a plain daily log
+        if "." + suffix not in suffixes or name[10:] and not (name[10] == "-" and segment.isdigit()):
+            continue
+        try:
+            day = date.fromisoformat(name[:10])
+        except ValueError:
+            continue
+        if start is not None and day < start.date():
+            continue
+        if end is not None and datetime.combine(day, datetime.min.time()) >= end:
+            continue
+        files.append((day, int(segment or 0), path))
+    return [(day, path) for day, _, path in sorted(files)]
+
+
+# ------------------ Mergeable partial aggregates --------------------
+def _summary_partial(chunks, fields):
+    """{module_id: {field: [count, sum, min, max, Counter(histogram bin -> count)]}}"""
+    partial = {}
+    for rows in chunks:
+        ids = rows["module_id"]
+        for module_id in np.unique(ids):
+            selected = rows[ids == module_id]
+            stats = partial.setdefault(int(module_id), {})
+            for field in fields:
+                values = selected[field].astype(np.float64)
+                values = values[np.isfinite(values)]
+                if not len(values):
+                    continue
+                s = stats.setdefault(field, [0, 0.0, np.inf, -np.inf, Counter()])
+                s[0] += len(values)
+                s[1] += float(values.sum())
+                s[2] = min(s[2], float(values.min()))
+                s[3] = max(s[3], float(values.max()))
+                bins, counts = np.unique(np.round(values / RESOLUTION[field]).astype(np.int64), return_counts=True)
+                s[4].update(dict(zip(bins.tolist(), counts.tolist())))
+    return partial
+
+
+def _merge_summary(total, partial):
+    for module_id, stats in partial.items():
+        into = total.setdefault(module_id, {})
+        for field, (count, total_sum, lo, hi, hist) in stats.items():
+            s = into.setdefault(field, [0, 0.0, np.inf, -np.inf, Counter()])
+            s[0] += count
+            s[1] += total_sum
+            s[2] = min(s[2], lo)
+            s[3] = max(s[3], hi)
+            s[4].update(hist)
+    return total
+
+
+def _percentile(hist, count, q, resolution):
+    rank = q / 100 * count
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if seen >= rank:
+            return round(value * resolution, 9)
+    return None
+
+
+def _downsample_partial(chunks, field, interval):
+    """{(module_id, bucket): [count, sum, min, max]}"""
+    partial = {}
+    for rows in chunks:
+        values = rows[field].astype(np.float64)
+        ok = np.isfinite(values)
+        if not ok.any():
+            continue
+        values = values[ok]
+        buckets = rows["timestamp"][ok].astype(np.int64) // interval
+        ids = rows["module_id"][ok]
+        order = np.lexsort((buckets, ids))
+        ids, buckets, values = ids[order], buckets[order], values[order]
+        starts = np.flatnonzero(np.concatenate(([True], (ids[1:] != ids[:-1]) | (buckets[1:] != buckets[:-1]))))
+        counts = np.diff(np.append(starts, len(ids)))
+        sums = np.add.reduceat(values, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        for module_bucket, n, total, lo, hi in zip(zip(ids[starts].tolist(), buckets[starts].tolist()),
+                                                   counts.tolist(), sums.tolist(), mins.tolist(), maxs.tolist()):
+            s = partial.get(module_bucket)
+            if s is None:
+                partial[module_bucket] = [n, total, lo, hi]
+            else:
+                s[0] += n
+                s[1] += total
+                s[2] = min(s[2], lo)
+                s[3] = max(s[3], hi)
+    return partial
+
+
+def _merge_downsample(total, partial):
+    for key, (n, total_sum, lo, hi) in partial.items():
+        s = total.get(key)
+        if s is None:
+            total[key] = [n, total_sum, lo, hi]
+        else:
+            s[0] += n
+            s[1] += total_sum
+            s[2] = min(s[2], lo)
+            s[3] = max(s[3], hi)
+    return total
+
+
+class LogAnalytics:
+    """Time-range queries over ``logs_dir``; aggregates of closed days are cached in ``cache_dir``."""
+
+    def __init__(self, logs_dir="logs", cache_dir=None):
+        self.logs_dir = Path(logs_dir)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else self.logs_dir / ".analytics"
+        self._indexes = {}
+        self._memory = {}
+
+    def index(self, path):
+        """Up-to-date FileIndex of ``path``; None for compressed logs, which cannot seek."""
+        if _compressed(path):
+            return None
+        index = self._indexes.get(path)
+        if index is None:
+            index = self._indexes[path] = FileIndex(path)
+        return index.update()
+
+    def chunks(self, start=None, end=None):
+        """Yield ROW_DTYPE arrays of all logged rows with ``start <= timestamp < end``."""
+        for _, path in day_files(self.logs_dir, start, end):
+            yield from iter_file_chunks(path, start, end, self.index(path) if start is not None else None)
+
+    # ------------------ Per-day partials, cached for closed days --------------------
+    def _day_partials(self, start, end, kind, params, compute):
+        for day, path in day_files(self.logs_dir, start, end):
+            day_start = datetime.combine(day, datetime.min.time())
+            day_end = day_start + timedelta(days=1)
+            whole_day = (start is None or start <= day_start) and (end is None or end >= day_end)
+            closed = day < date.today()
+            if not (whole_day and closed):
+                index = self.index(path) if start is not None and start > day_start else None
+                yield compute(iter_file_chunks(path, start, end, index))
+                continue
+            stat = path.stat()
+            key = f"{path.name}-{kind}-{params}-{stat.st_size}-{stat.st_mtime_ns}"
+            partial = self._memory.get(key)
+            if partial is None:
+                partial = self._load(kind, key)
+            if partial is None:
+                partial = compute(iter_file_chunks(path))
+                self._store(kind, key, partial)
+            self._memory[key] = partial
+            yield partial
+
+    def _cache_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, kind, key):
+        try:
+            with self._cache_path(key).open(encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if kind == "summary":
+            return {
+                int(module_id): {
+                    field: [count, total, lo, hi, Counter({int(k): v for k, v in hist})]
+                    for field, (count, total, lo, hi, hist) in stats.items()
+                }
+                for module_id, stats in data.items()
+            }
+        return {(module_id, bucket): s for module_id, bucket, *s in data}
+
+    def _store(self, kind, key, partial):
+        if kind == "summary":
+            data = {
+                module_id: {
+                    field: [count, total, lo, hi, sorted(hist.items())]
+                    for field, (count, total, lo, hi, hist) in stats.items()
+                }
+                for module_id, stats in partial.items()
+            }
+        else:
+            data = [[module_id, bucket, *s] for (module_id, bucket), s in partial.items()]
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._cache_path(key).with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self._cache_path(key))
+        except OSError as e:
+            print(f"ERROR: Failed to cache aggregates in {self.cache_dir}: {e}")
+
+    # ------------------ Queries --------------------
+    def summary(self, start=None, end=None, fields=FIELDS, percentiles=PERCENTILES):
+        """Per module and field: count, min, max, mean and percentiles (p50 ... ) over [start, end)."""
+        fields = tuple(fields)
+        total = {}
+        for partial in self._day_partials(start, end, "summary", "-".join(fields),
+                                          lambda chunks: _summary_partial(chunks, fields)):
+            _merge_summary(total, partial)
+        result = {}
+        for module_id, stats in sorted(total.items()):
+            result[module_id] = {}
+            for field, (count, total_sum, lo, hi, hist) in stats.items():
+                values = {"count": count, "min": lo, "max": hi, "mean": total_sum / count}
+                for q in percentiles:
+                    values[f"p{q}"] = _percentile(hist, count, q, RESOLUTION[field])
+                result[module_id][field] = values
+        return result
+
+    def downsample(self, start=None, end=None, interval=60, field="concentration"):
+        """Per module: a record array of bucket start, count, mean, min and max of ``field``
+        over fixed ``interval``-second buckets in [start, end)."""
+        total = {}
+        for partial in self._day_partials(start, end, "downsample", f"{field}-{interval}",
+                                          lambda chunks: _downsample_partial(chunks, field, interval)):
+            _merge_downsample(total, partial)
+        dtype = np.dtype([("timestamp", "datetime64[s]"), ("count", "<u4"), ("mean", "<f8"),
+                          ("min", "<f8"), ("max", "<f8")])
+        per_module = {}
+        for (module_id, bucket), (n, total_sum, lo, hi) in total.items():
+            per_module.setdefault(module_id, []).append((bucket * interval, n, total_sum / n, lo, hi))
+        return {
+            module_id: np.array(sorted(buckets), dtype=dtype)
+            for module_id, buckets in sorted(per_module.items())
+        }
@@ -0,0 +1,56 @@
+"""Decode many 256-byte register pages at once with NumPy.
+
+The page layout is expressed as a structured dtype built from REGISTER_SCHEMA
+(field offsets = register addresses, itemsize = one page), so a stacked buffer
+of N pages is decoded by viewing it, without a per-page Python loop.
+"""
+import numpy as np
+
+from registers import REGISTERS_PAGE_SIZE, REGISTER_SCHEMA
+
+# struct format -> little-endian NumPy type
+_NUMPY_TYPES = {
+    "B": "u1",
+    "b": "i1",
+    "H": "<u2",
+    "h": "<i2",
+    "I": "<u4",
+    "i": "<i4",
+    "f": "<f4",
+}
+
+
+def page_dtype(schema=REGISTER_SCHEMA):
+    return np.dtype({
+        "names": [name for name, _, _ in schema],
+        "formats": [_NUMPY_TYPES[fmt] for _, _, fmt in schema],
+        "offsets": [int(register) for _, register, _ in schema],
+        "itemsize": REGISTERS_PAGE_SIZE,
+    })
+
+
+PAGE_DTYPE = page_dtype()
+
+
+def view_pages(pages):
+    """View ``pages`` (bytes-like of N*256 bytes or an (N, 256) uint8 array) as N structured records."""
+    if isinstance(pages, np.ndarray):
+        if pages.dtype != np.uint8 or pages.ndim != 2 or pages.shape[1] != REGISTERS_PAGE_SIZE:
+            raise ValueError(f"expected an (N, {REGISTERS_PAGE_SIZE}) uint8 array, got {pages.shape} {pages.dtype}")
+        return np.ascontiguousarray(pages).view(PAGE_DTYPE).reshape(len(pages))
+    if len(pages) % REGISTERS_PAGE_SIZE:
+        raise ValueError(f"buffer length {len(pages)} is not a multiple of {REGISTERS_PAGE_SIZE}")
+    return np.frombuffer(pages, dtype=PAGE_DTYPE)
+
+
+def decode_pages(pages, copy=True):
+    """Return {field: array of N values} for every REGISTER_SCHEMA field.
+
+    Values match Module.deserialize field by field (floats stay float32). With
+    ``copy=False`` the columns are strided views into ``pages``.
+    """
+    records = view_pages(pages)
+    return {
+        name: records[name].copy() if copy else records[name]
+        for name in records.dtype.names
+    }
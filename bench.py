@@ -0,0 +1,434 @@
+"""Benchmarks for the protocol, decode, logging and acquisition hot paths.
+
+Device-facing benchmarks run against simulated modules on Linux
+pseudo-terminals (needs pyserial). Examples::
+
+    python bench.py                              # run all, print table
+    python bench.py --json baseline.json         # also save results
+    python bench.py --compare baseline.json      # flag regressions, exit 1 if any
+    python bench.py --filter crc16 --filter frame
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from capture import CaptureWriter, ReplaySerial, load_capture, replay_decode
+from cli import log_module, run_cycle
+from client import build_registers_read_full_register_pageframe, build_registers_write_frame
+from connection import Connection, ping_module, send_frame
+from fleet import DeviceSchedule, FleetPoller
+from logger import CsvLogger
+from measurement import MeasurementWaiter, run_measurement
+from module import Module, CONTROL_SHT40_MEASUREMENT_SET
+from protocol import (
+    ACK,
+    OPERATION_READ,
+    OPERATION_WRITE,
+    _crc16_ccitt_false,
+    _crc16_ccitt_false_table,
+    build_frame,
+    process_frame,
+)
+from registers import REGISTERS_PAGE_SIZE, Registers
+from simulator import Simulator, SimulatedModule
+
+DEFAULT_DURATION = 1.0
+DEFAULT_THRESHOLD = 0.10
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _summarize(latencies_ns, elapsed_s, ops):
+    latencies_ns.sort()
+    result = {"ops": ops, "ops_per_sec": ops / elapsed_s if elapsed_s else 0.0}
+    for name, q in (("p50_us", 0.50), ("p90_us", 0.90), ("p99_us", 0.99), ("max_us", 1.0)):
+        value = _percentile(latencies_ns, q)
+        result[name] = None if value is None else value / 1000.0
+    return result
+
+
+def measure(fn, duration=DEFAULT_DURATION):
+    """Call ``fn`` repeatedly for ``duration`` seconds; return ops/sec and latency percentiles."""
+    fn()  # warm up
+    latencies = []
+    clock = time.perf_counter_ns
+    start = clock()
+    end = start + int(duration * 1e9)
+    while True:
+        t0 = clock()
+        fn()
+        t1 = clock()
+        latencies.append(t1 - t0)
+        if t1 >= end:
+            break
+    return _summarize(latencies, (clock() - start) / 1e9, len(latencies))
+
+
+# --------------------- Fixtures ---------------------
+def _sample_page():
+    page = bytearray(REGISTERS_PAGE_SIZE)
+    page[Registers.REG_MAP_VER_MSB] = 1
+    page[Registers.REG_FIRMWARE_VER_MSB] = 1
+    struct.pack_into("<fff", page, Registers.REG_CONCENTRATION_LLSB, 20.9, 22.0, 45.0)
+    struct.pack_into("<I", page, Registers.REG_DEVICE_ID_LLSB, 0x12345678)
+    return bytes(page)
+
+
+def _response_frame(payload):
+    frame = build_frame(OPERATION_WRITE, 0x0000, payload, len(payload))
+    frame[1] = ACK
+    crc = _crc16_ccitt_false(memoryview(frame)[1:-3])
+    frame[-3], frame[-2] = crc & 0xFF, crc >> 8
+    return frame
+
+
+# --------------------- CPU benchmarks ---------------------
+def bench_crc16(size, crc=_crc16_ccitt_false):
+    def run(duration):
+        data = (bytes(range(256)) * (size // 256 + 1))[:size]
+        return measure(lambda: crc(data), duration)
+    return run
+
+
+def bench_build_frame(duration):
+    return measure(lambda: build_frame(OPERATION_WRITE, Registers.REG_CONTROL, [0x01], 1), duration)
+
+
+def bench_process_frame(duration):
+    frame = _response_frame(_sample_page())
+    return measure(lambda: process_frame(frame), duration)
+
+
+def bench_frame_roundtrip(duration):
+    payload = _sample_page()
+    return measure(lambda: process_frame(_response_frame(payload)), duration)
+
+
+def bench_deserialize(duration):
+    page = _sample_page()
+    module = Module()
+    return measure(lambda: module.deserialize(page), duration)
+
+
+def bench_decode_pages_1000(duration):
+    """Batch decode of 1000 pages; one op is one page."""
+    from batch import decode_pages
+    pages = _sample_page() * 1000
+    result = measure(lambda: decode_pages(pages), duration)
+    result["ops"] *= 1000
+    result["ops_per_sec"] *= 1000
+    return result
+
+
+def bench_csv_log(duration):
+    module = Module()
+    module.deserialize(_sample_page())
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            return measure(lambda: log_module(module), duration)
+        finally:
+            os.chdir(cwd)
+
+
+def bench_csv_logger(duration):
+    """Acquisition-side cost of CsvLogger.log(); the writes happen on its thread."""
+    module = Module()
+    module.deserialize(_sample_page())
+    with tempfile.TemporaryDirectory() as tmp:
+        with CsvLogger(tmp) as logger:
+            return measure(lambda: logger.log(module), duration)
+
+
+def _write_log_days(logs_dir, days=3, step=10, modules=2):
+    """Daily CSV logs of ``modules`` modules with one row per ``step`` seconds, ending well before today."""
+    module = Module()
+    module.deserialize(_sample_page())
+    first = datetime.combine(date.today() - timedelta(days=days + 7), datetime.min.time())
+    with CsvLogger(logs_dir, flush_rows=10_000) as logger:
+        for i in range(days * 86400 // step):
+            ts = first + timedelta(seconds=i * step)
+            for module_id in range(modules):
+                module.module_id = module_id
+                module.concentration = 20.9 + (i % 50) / 1000
+                logger.log(module, ts)
+    return first
+
+
+def bench_analytics(query, cached):
+    """LogAnalytics over 3 days x 2 modules at 0.1 Hz; one op is one query, from the per-day cache or not."""
+    from analytics import LogAnalytics
+
+    def run(duration):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = _write_log_days(os.path.join(tmp, "logs"))
+            start, end = first, first + timedelta(days=3)
+            if query == "range":
+                start, end = first + timedelta(days=1, hours=12), first + timedelta(days=1, hours=13)
+            warm = LogAnalytics(os.path.join(tmp, "logs"), os.path.join(tmp, "cache"))
+
+            def once():
+                analytics = warm if cached else LogAnalytics(os.path.join(tmp, "logs"), os.path.join(tmp, "nocache"))
+                if query == "summary":
+                    analytics.summary(start, end)
+                elif query == "downsample":
+                    analytics.downsample(start, end, interval=3600)
+                else:
+                    sum(len(rows) for rows in analytics.chunks(start, end))
+                if not cached:
+                    shutil.rmtree(os.path.join(tmp, "nocache"), ignore_errors=True)
+            return measure(once, duration)
+    return run
+
+
+# --------------------- Device benchmarks ---------------------
+def _bus_cycle_per_call_open(port):
+    """The frame sequence of one cli_app cycle (without waits), port reopened per call."""
+    read_frame = build_registers_read_full_register_pageframe()
+    write_frame = build_registers_write_frame(Registers.REG_CONTROL, [0x02])
+    for _ in range(2):
+        ping_module(port)
+        ping_module(port)
+        send_frame(port, write_frame, OPERATION_WRITE)
+        send_frame(port, read_frame, OPERATION_READ)
+
+
+def _bus_cycle_session(conn):
+    read_frame = build_registers_read_full_register_pageframe()
+    write_frame = build_registers_write_frame(Registers.REG_CONTROL, [0x02])
+    for _ in range(2):
+        conn.ping()
+        conn.ping()
+        conn.send_frame(write_frame, OPERATION_WRITE)
+        conn.send_frame(read_frame, OPERATION_READ)
+
+
+def bench_bus_per_call_open(duration):
+    with Simulator() as sim:
+        port = sim.add(SimulatedModule())
+        return measure(lambda: _bus_cycle_per_call_open(port), duration)
+
+
+def bench_bus_session(duration):
+    with Simulator() as sim:
+        port = sim.add(SimulatedModule())
+        with Connection(port) as conn:
+            return measure(lambda: _bus_cycle_session(conn), duration)
+
+
+def bench_cli_cycle(duration):
+    """Full run_cycle (wake, SHT40 + O2 with completion polling, read, print, log)."""
+    cwd = os.getcwd()
+    with Simulator() as sim, tempfile.TemporaryDirectory() as tmp:
+        port = sim.add(SimulatedModule(sht40_time=0.001, o2_time=0.002))
+        os.chdir(tmp)
+        try:
+            with Connection(port) as conn, contextlib.redirect_stdout(io.StringIO()) as out:
+                waiter = MeasurementWaiter(conn)
+
+                def cycle():
+                    run_cycle(conn, waiter=waiter)
+                    out.seek(0)
+                    out.truncate()
+                return measure(cycle, duration)
+        finally:
+            os.chdir(cwd)
+
+
+def bench_fleet_sequential(duration, n_devices=8, measurement_time=0.05):
+    with Simulator() as sim:
+        ports = [sim.add(SimulatedModule(module_id=i, sht40_time=measurement_time)) for i in range(n_devices)]
+        conns = [Connection(port) for port in ports]
+        waiters = [MeasurementWaiter(c) for c in conns]
+        module = Module()
+
+        def sweep():
+            for conn, waiter in zip(conns, waiters):
+                conn.ping()
+                run_measurement(conn, module, CONTROL_SHT40_MEASUREMENT_SET, waiter)
+        result = measure(sweep, duration)
+        for conn in conns:
+            conn.close()
+    # Report readings, not sweeps
+    result["ops"] *= n_devices
+    result["ops_per_sec"] *= n_devices
+    return result
+
+
+def bench_fleet_poller(duration, n_devices=8, measurement_time=0.05):
+    with Simulator() as sim:
+        ports = [sim.add(SimulatedModule(module_id=i, sht40_time=measurement_time)) for i in range(n_devices)]
+        latencies = []
+        last = {}
+
+        def on_reading(port, module):
+            now = time.perf_counter_ns()
+            if port in last:
+                latencies.append(now - last[port])
+            last[port] = now
+
+        poller = FleetPoller((DeviceSchedule(port, sht40_interval=0.0) for port in ports), on_reading=on_reading)
+        start = time.perf_counter()
+        with poller:
+            time.sleep(max(duration, 1.0))
+        elapsed = time.perf_counter() - start
+        ops = sum(s.readings for s in poller.results().values())
+    return _summarize(latencies, elapsed, ops)
+
+
+def _record_capture(path, cycles=50):
+    """Capture ``cycles`` bus sessions against a simulated module."""
+    with Simulator() as sim:
+        port = sim.add(SimulatedModule())
+        with CaptureWriter(path) as cap, Connection(port, capture=cap) as conn:
+            for _ in range(cycles):
+                _bus_cycle_session(conn)
+    return load_capture(path)
+
+
+def bench_replay_decode(duration):
+    """Captured read responses through FrameDecoder/process_frame/Module; one op is one frame."""
+    with tempfile.TemporaryDirectory() as tmp:
+        records = _record_capture(os.path.join(tmp, "bus.cap"))
+    module = Module()
+    frames = replay_decode(records, module)[0]
+    result = measure(lambda: replay_decode(records, module), duration)
+    result["ops"] *= frames
+    result["ops_per_sec"] *= frames
+    return result
+
+
+def bench_replay_session(duration):
+    """_bus_cycle_session on a Connection fed by a fast capture replay (no serial port)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        records = _record_capture(os.path.join(tmp, "bus.cap"), cycles=1)
+
+    def cycle():
+        with Connection("replay", transport=ReplaySerial(records)) as conn:
+            _bus_cycle_session(conn)
+    return measure(cycle, duration)
+
+
+BENCHMARKS = {
+    "crc16_16B": bench_crc16(16),
+    "crc16_64B": bench_crc16(64),
+    "crc16_265B": bench_crc16(265),
+    "crc16_table_265B": bench_crc16(265, _crc16_ccitt_false_table),
+    "build_frame_write": bench_build_frame,
+    "process_frame_page": bench_process_frame,
+    "frame_roundtrip_page": bench_frame_roundtrip,
+    "module_deserialize_page": bench_deserialize,
+    "decode_pages_batch": bench_decode_pages_1000,
+    "csv_log_row": bench_csv_log,
+    "csv_logger_row": bench_csv_logger,
+    "bus_cycle_per_call_open": bench_bus_per_call_open,
+    "bus_cycle_session": bench_bus_session,
+    "cli_cycle_sim": bench_cli_cycle,
+    "fleet8_sequential": bench_fleet_sequential,
+    "fleet8_poller": bench_fleet_poller,
+    "replay_decode_frame": bench_replay_decode,
+    "replay_bus_cycle": bench_replay_session,
+    "analytics_summary_cold": bench_analytics("summary", cached=False),
+    "analytics_summary_cached": bench_analytics("summary", cached=True),
+    "analytics_downsample_cached": bench_analytics("downsample", cached=True),
+    "analytics_range_1h": bench_analytics("range", cached=True),
+}
+
+
+# --------------------- Reporting ---------------------
+def run(names, duration=DEFAULT_DURATION):
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](duration)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return {name: (baseline ops/s, current ops/s, ratio, regressed)} for benchmarks in both reports."""
+    diff = {}
+    for name, current in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("ops_per_sec"):
+            continue
+        ratio = current["ops_per_sec"] / old["ops_per_sec"]
+        diff[name] = (old["ops_per_sec"], current["ops_per_sec"], ratio, ratio < 1.0 - threshold)
+    return diff
+
+
+def _fmt(value):
+    return f"{'-':>10}" if value is None else f"{value:10.1f}"
+
+
+def print_report(report, diff=None):
+    print(f"{'benchmark':<26} {'ops/s':>12} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10}" + ("  vs baseline" if diff else ""))
+    for name, r in report["results"].items():
+        line = f"{name:<26} {r['ops_per_sec']:12.1f} {_fmt(r['p50_us'])} {_fmt(r['p90_us'])} {_fmt(r['p99_us'])}"
+        if diff and name in diff:
+            _, _, ratio, regressed = diff[name]
+            line += f"  {ratio:6.2f}x" + ("  REGRESSION" if regressed else "")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON ('-' for stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a stored JSON report")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative ops/sec drop counted as a regression (default 0.10)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds per benchmark")
+    parser.add_argument("--filter", action="append", default=[], help="only run benchmarks containing this text")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    names = [n for n in BENCHMARKS if not args.filter or any(f in n for f in args.filter)]
+    report = run(names, args.duration)
+
+    diff = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            diff = compare(report, json.load(f), args.threshold)
+        report["compare"] = {
+            "baseline": args.compare,
+            "threshold": args.threshold,
+            "regressions": [name for name, d in diff.items() if d[3]],
+        }
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report, diff)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if diff and any(d[3] for d in diff.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Acquisition broker: owns the modules and serves readings over a UNIX socket.
+
+Consumers send one JSON object per line and get one JSON line back::
+
+    {"cmd": "get", "port": "/dev/ttyUSB0", "kind": "o2", "max_age": 5}
+    {"cmd": "measure", "port": "/dev/ttyUSB0", "kind": "sht40"}
+    {"cmd": "list"}
+
+``get`` answers from the cache when the last reading of that kind is younger
+than ``max_age`` (default: the broker TTL) and measures otherwise; ``measure``
+always triggers a new measurement. Concurrent measurements of the same kind on
+the same module are collapsed into one bus transaction. Run it with::
+
+    python broker.py serve /dev/ttyUSB0 /dev/ttyUSB1
+    python broker.py get /dev/ttyUSB0
+
+``serve --metrics-port 9464`` also exposes bus timings and error counters at
+http://127.0.0.1:9464/metrics in Prometheus text format.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from connection import Connection
+from measurement import MEASUREMENT_NAMES, MeasurementWaiter, run_measurement
+from metrics import METRICS
+from module import Module
+
+DEFAULT_SOCKET = "/tmp/faradayox.sock"
+DEFAULT_TTL = 5.0
+MEASUREMENT_KINDS = {name: control_bit for control_bit, name in MEASUREMENT_NAMES.items()}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class DeviceHandle:
+    """One module: its connection, the bus lock and the per-kind reading cache."""
+
+    def __init__(self, port, *, wait_for_completion=True):
+        self.port = port
+        self.conn = Connection(port)
+        self.waiter = MeasurementWaiter(self.conn) if wait_for_completion else None
+        self.module = Module()
+        self.measurements = 0
+        self._bus = threading.Lock()
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._cache = {}  # control bit -> (monotonic, reading dict)
+
+    def close(self):
+        with self._bus:
+            self.conn.close()
+
+    def cached(self, control_bit, max_age):
+        with self._lock:
+            entry = self._cache.get(control_bit)
+        if entry is None or time.monotonic() - entry[0] > max_age:
+            return None
+        return entry
+
+    def measure(self, control_bit, timeout=10.0):
+        """Measure now, or join the measurement of this kind already in flight."""
+        with self._lock:
+            flight = self._flights.get(control_bit)
+            leader = flight is None
+            if leader:
+                flight = self._flights[control_bit] = _Flight()
+        if not leader:
+            flight.done.wait(timeout)
+            return flight.result
+        try:
+            with self._bus:
+                if self.conn.ping() and run_measurement(self.conn, self.module, control_bit, self.waiter):
+                    self.measurements += 1
+                    reading = self.module.to_dict()
+                    reading["timestamp"] = time.time()
+                    flight.result = (time.monotonic(), reading)
+                    with self._lock:
+                        self._cache[control_bit] = flight.result
+        finally:
+            with self._lock:
+                del self._flights[control_bit]
+            flight.done.set()
+        return flight.result
+
+
+class Broker:
+    def __init__(self, ports, socket_path=DEFAULT_SOCKET, *, ttl=DEFAULT_TTL, wait_for_completion=True):
+        self.socket_path = socket_path
+        self.ttl = ttl
+        self.devices = {port: DeviceHandle(port, wait_for_completion=wait_for_completion) for port in ports}
+        self._server = None
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        if cmd == "list":
+            return {"ok": True, "ports": list(self.devices)}
+        if cmd not in ("get", "measure"):
+            return {"ok": False, "error": f"unknown cmd {cmd!r}"}
+        device = self.devices.get(request.get("port"))
+        if device is None:
+            return {"ok": False, "error": f"unknown port {request.get('port')!r}"}
+        control_bit = MEASUREMENT_KINDS.get(request.get("kind", "o2"))
+        if control_bit is None:
+            return {"ok": False, "error": f"unknown kind {request.get('kind')!r}"}
+
+        max_age = request.get("max_age", self.ttl)
+        if isinstance(max_age, bool) or not isinstance(max_age, (int, float)):
+            return {"ok": False, "error": f"bad max_age {max_age!r}"}
+
+        entry = None
+        cached = False
+        if cmd == "get":
+            entry = device.cached(control_bit, max_age)
+            cached = entry is not None
+        if entry is None:
+            entry = device.measure(control_bit)
+        if entry is None:
+            return {"ok": False, "error": f"measurement failed on {device.port}"}
+        taken, reading = entry
+        return {"ok": True, "port": device.port, "cached": cached,
+                "age_s": time.monotonic() - taken, "reading": reading}
+
+    def serve_forever(self):
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = broker.handle(json.loads(line))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        response = {"ok": False, "error": f"bad request: {e}"}
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+                    self.wfile.flush()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            os.unlink(self.socket_path)
+            for device in self.devices.values():
+                device.close()
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
+
+
+class BrokerClient:
+    """Keeps one connection to the broker socket open for repeated queries."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._file = self._sock.makefile("rwb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def request(self, **request):
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        return json.loads(self._file.readline())
+
+    def get(self, port, kind="o2", max_age=None):
+        request = {"cmd": "get", "port": port, "kind": kind}
+        if max_age is not None:
+            request["max_age"] = max_age
+        return self.request(**request)
+
+    def measure(self, port, kind="o2"):
+        return self.request(cmd="measure", port=port, kind=kind)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve", help="run the broker")
+    serve.add_argument("ports", nargs="+")
+    serve.add_argument("--ttl", type=float, default=DEFAULT_TTL)
+    serve.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    for name in ("get", "measure"):
+        p = sub.add_parser(name, help=f"{name} a reading from a running broker")
+        p.add_argument("port")
+        p.add_argument("--kind", default="o2", choices=sorted(MEASUREMENT_KINDS))
+    args = parser.parse_args(argv)
+
+    if args.cmd == "serve":
+        broker = Broker(args.ports, args.socket, ttl=args.ttl)
+        if args.metrics_port:
+            METRICS.serve(("127.0.0.1", args.metrics_port))
+        print(f"Serving {', '.join(args.ports)} on {args.socket}")
+        try:
+            broker.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    with BrokerClient(args.socket) as client:
+        response = client.request(cmd=args.cmd, port=args.port, kind=args.kind)
+    print(json.dumps(response, indent=2))
+    return 0 if response.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
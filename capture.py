@@ -0,0 +1,200 @@
+"""Raw serial capture files and replay.
+
+A capture is a header followed by records of (monotonic ns since capture
+start, direction, length) and the raw bytes, one record per write and per
+non-empty read done by a Connection::
+
+    with CaptureWriter("unit42.cap") as cap, Connection(port, capture=cap) as conn:
+        cli.run_cycle(conn)
+
+ReplaySerial plays a capture back to a Connection in place of the port, at the
+original timing or as fast as possible; replay_decode() runs the captured
+responses straight through FrameDecoder/process_frame/Module.
+"""
+import struct
+import threading
+import time
+
+from module import Module
+from protocol import (
+    FRAME_ADDR_LSB_POS,
+    FRAME_ADDR_MSB_POS,
+    FRAME_LEN_LSB_POS,
+    FRAME_LEN_MSB_POS,
+    FRAME_OP_POS,
+    FRAME_PROTOCOL_PREFIX_LEN,
+    OPERATION_READ,
+    FrameDecoder,
+    process_frame,
+)
+
+MAGIC = b"FOXCAP1\n"
+RECORD = struct.Struct("<QBH")
+WRITE = 0  # host -> device
+READ = 1   # device -> host
+
+
+class CaptureWriter:
+    """Append capture records to ``path``; safe to share between connections.
+
+    Every record is flushed to the OS as it is written, so a capture survives a
+    crash or kill of the process and can be read while it is still running.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.flush()
+        self._start = time.monotonic_ns()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _record(self, direction, data):
+        header = RECORD.pack(time.monotonic_ns() - self._start, direction, len(data))
+        with self._lock:
+            self._file.write(header)
+            self._file.write(data)
+            self._file.flush()
+
+    def write(self, data):
+        self._record(WRITE, data)
+
+    def read(self, data):
+        self._record(READ, data)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def load_capture(path):
+    """Return the list of (t_ns, direction, bytes) records in a capture file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a capture file")
+    records = []
+    pos = len(MAGIC)
+    while pos + RECORD.size <= len(data):
+        t_ns, direction, length = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        records.append((t_ns, direction, data[pos:pos + length]))
+        pos += length
+    return records
+
+
+def exchanges(records):
+    """Group records into (request bytes, [response chunks]) per write."""
+    result = []
+    for _, direction, data in records:
+        if direction == WRITE:
+            result.append((data, []))
+        elif result:
+            result[-1][1].append(data)
+    return result
+
+
+class ReplaySerial:
+    """pyserial stand-in that answers each write with the reads captured after it.
+
+    With ``realtime`` each chunk becomes readable at its original delay after
+    the write; otherwise immediately. Once the captured chunks of an exchange
+    are used up, reads time out after ``timeout`` seconds as a real port would.
+    """
+
+    def __init__(self, records, *, realtime=False, timeout=0.05):
+        if isinstance(records, str):
+            records = load_capture(records)
+        self.realtime = realtime
+        self.timeout = timeout
+        self.is_open = True
+        self.mismatches = 0
+        self._records = records
+        self._cursor = 0
+        self._chunks = []  # (available at monotonic ns, bytes)
+        self._buf = bytearray()
+
+    @property
+    def exhausted(self):
+        return self._cursor >= len(self._records) and not self._chunks and not self._buf
+
+    def write(self, data):
+        records = self._records
+        while self._cursor < len(records) and records[self._cursor][1] != WRITE:
+            self._cursor += 1
+        if self._cursor >= len(records):
+            return len(data)
+        t_write, _, captured = records[self._cursor]
+        if bytes(captured) != bytes(data):
+            self.mismatches += 1
+        self._cursor += 1
+        now = time.monotonic_ns()
+        while self._cursor < len(records) and records[self._cursor][1] == READ:
+            t_read, _, chunk = records[self._cursor]
+            self._chunks.append((now + (t_read - t_write if self.realtime else 0), chunk))
+            self._cursor += 1
+        return len(data)
+
+    def _release(self):
+        now = time.monotonic_ns()
+        while self._chunks and self._chunks[0][0] <= now:
+            self._buf += self._chunks.pop(0)[1]
+
+    @property
+    def in_waiting(self):
+        self._release()
+        return len(self._buf)
+
+    def read(self, size=1):
+        deadline = time.monotonic_ns() + int(self.timeout * 1e9)
+        while True:
+            self._release()
+            if len(self._buf) >= size or (self._buf and not self._chunks):
+                break
+            if not self._chunks:
+                time.sleep(max(0.0, (deadline - time.monotonic_ns()) / 1e9))
+                break
+            wait_until = min(self._chunks[0][0], deadline)
+            if wait_until <= time.monotonic_ns():
+                break
+            time.sleep((wait_until - time.monotonic_ns()) / 1e9)
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def reset_input_buffer(self):
+        self._buf.clear()
+
+    def close(self):
+        pass
+
+
+def replay_decode(records, module=None):
+    """Decode every captured read response into ``module``; return (frames, decoded, errors)."""
+    if module is None:
+        module = Module()
+    frames = decoded = errors = 0
+    for request, chunks in exchanges(records):
+        if len(request) < FRAME_PROTOCOL_PREFIX_LEN or request[FRAME_OP_POS] != OPERATION_READ:
+            continue
+        address = request[FRAME_ADDR_LSB_POS] | (request[FRAME_ADDR_MSB_POS] << 8)
+        length = request[FRAME_LEN_LSB_POS] | (request[FRAME_LEN_MSB_POS] << 8)
+        decoder = FrameDecoder(OPERATION_READ if length else None)
+        for chunk in chunks:
+            for frame in decoder.feed(chunk):
+                frames += 1
+                if not length:
+                    continue
+                payload = process_frame(frame)
+                if payload is None or len(payload) < length:
+                    errors += 1
+                else:
+                    module.deserialize_range(address, payload)
+                    decoded += 1
+    return frames, decoded, errors
@@ -1,50 +1,99 @@
-from module import Module
-from connection import ping_module, send_frame
-from client import build_registers_read_full_register_pageframe, build_registers_write_frame
-from protocol import OPERATION_READ, OPERATION_WRITE, process_frame
+from module import Module, CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+from measurement import MeasurementWaiter, wait_for_measurement
+from logger import CsvLogger, LOG_HEADER, format_log_row, module_values
+from deadband import DeadbandLogger
+from scheduler import AcquisitionScheduler
+from connection import Connection
+from metrics import METRICS
+import tracing
+from client import build_registers_read_frame, build_registers_write_frame, plan_register_reads
+from protocol import OPERATION_READ, OPERATION_WRITE
 import time
 import csv
 from pathlib import Path
 from datetime import datetime
 
 
-def cli_app(port: str = "COM5", *, measure_sht40: bool = True, measure_oxygen: bool = True):
+def cli_app(port: str = "COM5", *, measure_sht40: bool = True, measure_oxygen: bool = True,
+            wait_for_completion: bool = False):
+    with Connection(port) as conn, CsvLogger() as logger:
+        waiter = MeasurementWaiter(conn) if wait_for_completion else None
+        run_cycle(conn, measure_sht40=measure_sht40, measure_oxygen=measure_oxygen, waiter=waiter, logger=logger)
+        if waiter:
+            print(f"Measurement timing: {waiter.timing()}")
+        print(f"Bus stats: {conn.stats()}")
+
+
+def cli_continuous(port: str = "COM5", *, sht40_interval: float = 1.0, o2_interval: float = 10.0,
+                   duration: float = None, wait_for_completion: bool = True, deadband: bool = False,
+                   compression: str = None):
+    """Acquire at fixed rates until Ctrl-C (or ``duration`` seconds), then print scheduler stats.
+
+    With ``deadband`` only changed readings (plus a heartbeat) are logged, see deadband.py;
+    ``compression`` ("gzip"/"zstd") compresses the daily log files."""
+    with Connection(port) as conn, CsvLogger(compression=compression) as logger:
+        if deadband:
+            logger = DeadbandLogger(logger)
+        waiter = MeasurementWaiter(conn) if wait_for_completion else None
+        scheduler = AcquisitionScheduler(conn, sht40_interval=sht40_interval, o2_interval=o2_interval,
+                                         waiter=waiter, logger=logger, on_reading=print)
+        try:
+            scheduler.run(duration)
+        except KeyboardInterrupt:
+            pass
+        print(f"Acquisition stats: {scheduler.stats()}")
+        print(f"Bus stats: {conn.stats()}")
+
+
+def run_cycle(conn: Connection, *, measure_sht40: bool = True, measure_oxygen: bool = True,
+              waiter: MeasurementWaiter = None, logger: CsvLogger = None):
+    """One wake/measure/read/log pass. With a ``waiter`` the device status is polled
+    for completion instead of sleeping a fixed time after each trigger."""
     module = Module()
+    port = conn.port
 
     # Wake device
-    if not ping_module(port):
+    if not conn.ping():
         print(f"ERROR: Could not ping module on {port}")
-        return
+        return False
     time.sleep(0.01)
 
     # 1. Perform SHT40 (temperature/humidity) measurement set (optional)
     if measure_sht40:
-        if not ping_module(port):
+        if not conn.ping():
             print(f"ERROR: Could not ping module on {port}")
-            return
+            return False
         module.control_start_sht40_measurement_set()
         addr, data = module.serialize_control()
-        send_frame(port, build_registers_write_frame(addr, data), OPERATION_WRITE)
-        time.sleep(0.05)  # brief wait for measurement
-        if not request_and_log_registers(module, port, header="After SHT40 measurement"):
+        conn.send_frame(build_registers_write_frame(addr, data), OPERATION_WRITE)
+        # Polled with a waiter, otherwise a brief fixed wait
+        if not wait_for_measurement(conn, module, CONTROL_SHT40_MEASUREMENT_SET, waiter):
+            print(f"ERROR: SHT40 measurement did not complete on {port}")
+            return False
+        if not request_and_log_registers(module, conn, header="After SHT40 measurement", logger=logger):
             print("ERROR: Failed to read/log registers after SHT40 measurement")
-            return
+            return False
 
     # 2. Perform oxygen (concentration) measurement set (optional)
     if measure_oxygen:
-        if not ping_module(port):
+        if not conn.ping():
             print(f"ERROR: Could not ping module on {port}")
-            return
+            return False
         module.control_start_measurement_set()
         addr, data = module.serialize_control()
-        send_frame(port, build_registers_write_frame(addr, data), OPERATION_WRITE)
-        time.sleep(0.25)  # longer wait if needed for gas measurement
-        if not ping_module(port):
+        conn.send_frame(build_registers_write_frame(addr, data), OPERATION_WRITE)
+        # Polled with a waiter, otherwise a longer fixed wait for the gas measurement
+        if not wait_for_measurement(conn, module, CONTROL_MEASUREMENT_SET, waiter):
+            print(f"ERROR: O2 measurement did not complete on {port}")
+            return False
+        if not conn.ping():
             print(f"ERROR: Could not ping module on {port}")
-            return
-        if not request_and_log_registers(module, port, header="After O2 measurement"):
+            return False
+        if not request_and_log_registers(module, conn, header="After O2 measurement", logger=logger):
             print("ERROR: Failed to read/log registers after O2 measurement")
-            return
+            return False
+
+    return True
 
 
 def _log_file_path():
@@ -58,56 +107,51 @@ def _ensure_log_header(path: Path):
     if not path.exists():
         with path.open("w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow([
-                "timestamp",
-                "module_id",
-                "register_map_version",
-                "firmware_version",
-                "status",
-                "control",
-                "concentration",
-                "temperature",
-                "humidity",
-            ])
-
-
-def request_and_log_registers(module, port, header=None) -> bool:
-    status, frame = send_frame(port, build_registers_read_full_register_pageframe(), OPERATION_READ)
-    if not status:
-        print(f"ERROR: Read registers failed on {port} (no ACK/timeout)")
-        return False
-    frame_data = process_frame(frame)
-    if not frame_data:
-        op = frame[1] if frame and len(frame) >= 2 else None
-        if op is None:
-            print(f"ERROR: Invalid/empty response frame on {port}")
-        else:
-            print(f"ERROR: Invalid frame/CRC on {port} (op=0x{op:02X}, len={len(frame)})")
-        return False
-    if not module.deserialize(frame_data):
-        print(f"ERROR: Failed to deserialize register page (payload len={len(frame_data)})")
-        return False
+            writer.writerow(LOG_HEADER)
+
+
+def request_and_log_registers(module, conn: Connection, header=None, fields=None, logger: CsvLogger = None) -> bool:
+    """Read the registers backing ``fields`` (default: everything Module uses) and log a row,
+    through ``logger`` when given."""
+    port = conn.port
+    for address, length in plan_register_reads(fields):
+        status, frame = conn.send_frame(build_registers_read_frame(address, length), OPERATION_READ)
+        if not status:
+            print(f"ERROR: Read registers failed on {port} (no ACK/timeout)")
+            return False
+        frame_data = conn.process_response(frame, length)
+        if not frame_data:
+            op = frame[1] if frame and len(frame) >= 2 else None
+            if op is None:
+                print(f"ERROR: Invalid/empty response frame on {port}")
+            else:
+                print(f"ERROR: Invalid frame/CRC on {port} (op=0x{op:02X}, len={len(frame)})")
+            return False
+        if len(frame_data) < length:
+            print(f"ERROR: Failed to deserialize registers 0x{address:02X}+{length} (payload len={len(frame_data)})")
+            return False
+        module.deserialize_range(address, frame_data)
 
     if header:
         print(f"\n=== {header} ===")
     print(module)
 
-    # Logging
+    if logger:
+        logger.log(module)
+    else:
+        log_module(module)
+    return True
+
+
+def log_module(module):
+    """Append one row for ``module`` to today's CSV log (synchronous, reopens the file)."""
+    t0 = time.perf_counter_ns()
     path = _log_file_path()
     _ensure_log_header(path)
-    ts = datetime.now().isoformat(timespec="seconds")
     with path.open("a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            ts,
-            module.module_id,
-            f"{module.register_map_ver_major}.{module.register_map_ver_minor}",
-            f"{module.firmware_ver_major}.{module.firmware_ver_minor}",
-            f"0x{module.status:02X}",
-            f"0x{module.control:02X}",
-            f"{module.concentration:.6f}",
-            f"{module.temperature:.6f}",
-            f"{module.humidity:.6f}",
-        ])
-
-    return True
+        writer.writerow(format_log_row(datetime.now(), module_values(module)))
+    end = time.perf_counter_ns()
+    METRICS.phase("logs", "log_write").record(end - t0)
+    if tracing.TRACER is not None:
+        tracing.TRACER.complete("csv logs", "log_write", t0, end, {"rows": 1})
@@ -1,5 +1,9 @@
-from protocol import build_frame, OPERATION_READ, OPERATION_WRITE
-from registers import REGISTERS_PAGE_SIZE
+from protocol import build_frame, OPERATION_READ, OPERATION_WRITE, FRAME_PROTOCOL_OVERHEAD
+from registers import REGISTERS_PAGE_SIZE, REGISTER_FIELDS, DEFAULT_READ_FIELDS
+
+# Bytes of wire time one extra read round trip costs: request + response framing
+# plus roughly 3 ms device turnaround at 115200 baud (~11.5 bytes/ms).
+READ_MERGE_GAP = 2 * FRAME_PROTOCOL_OVERHEAD + 35
 
 
 def build_empty_read_frame():
@@ -8,11 +12,38 @@ def build_empty_read_frame():
     return frame
 
 
+def build_registers_read_frame(address, length):
+    frame = build_frame(OPERATION_READ, address, [], length)
+    return frame
+
+
 def build_registers_read_full_register_pageframe():
-    frame = build_frame(OPERATION_READ, 0x0000, [], REGISTERS_PAGE_SIZE)
+    frame = build_registers_read_frame(0x0000, REGISTERS_PAGE_SIZE)
     return frame
 
 
 def build_registers_write_frame(address, data):
     frame = build_frame(OPERATION_WRITE, address, data, len(data))
     return frame
+
+
+def plan_register_reads(fields=None, merge_gap=READ_MERGE_GAP):
+    """Return the (address, length) reads covering ``fields`` (names from REGISTER_FIELDS,
+    default: every field in the register schema).
+
+    Ranges separated by fewer than ``merge_gap`` unused bytes are read in one
+    frame, since reading the gap is cheaper than another round trip.
+    """
+    if fields is None:
+        fields = DEFAULT_READ_FIELDS
+    ranges = sorted(
+        (REGISTER_FIELDS[name][0], REGISTER_FIELDS[name][0] + REGISTER_FIELDS[name][1])
+        for name in fields
+    )
+    plan = []
+    for start, end in ranges:
+        if plan and start - plan[-1][1] <= merge_gap:
+            plan[-1][1] = max(plan[-1][1], end)
+        else:
+            plan.append([start, end])
+    return [(start, end - start) for start, end in plan]
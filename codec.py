@@ -0,0 +1,67 @@
+import struct
+
+from registers import REGISTER_SCHEMA
+
+
+class RegisterCodec:
+    """Decoder generated from a register schema of (name, register, format) entries.
+
+    For every (address, length) range it compiles, once, a single struct.Struct
+    covering all schema fields inside the range (gaps become pad bytes) and a
+    function assigning the unpacked tuple to the target's attributes in one
+    statement. ``storage`` maps a field name to the attribute that holds it when
+    they differ (e.g. a property backed by a private slot).
+    """
+
+    def __init__(self, schema=REGISTER_SCHEMA, storage=None):
+        self.schema = sorted(((name, int(register), fmt) for name, register, fmt in schema), key=lambda f: f[1])
+        self.storage = storage or {}
+        self._decoders = {}
+
+    def fields_in(self, address, length):
+        end = address + length
+        return [
+            (name, register, fmt)
+            for name, register, fmt in self.schema
+            if register >= address and register + struct.calcsize("<" + fmt) <= end
+        ]
+
+    def _compile(self, address, length):
+        fields = self.fields_in(address, length)
+        fmt = "<"
+        pos = address
+        for _, register, field_fmt in fields:
+            if register > pos:
+                fmt += f"{register - pos}x"
+            fmt += field_fmt
+            pos = register + struct.calcsize("<" + field_fmt)
+        names = tuple(name for name, _, _ in fields)
+        if not names:
+            return None, None, names
+        unpacker = struct.Struct(fmt)
+        targets = ", ".join(f"target.{self.storage.get(name, name)}" for name in names)
+        namespace = {"_unpack_from": unpacker.unpack_from}
+        exec(f"def decode(target, buf, offset=0):\n    {targets}, = _unpack_from(buf, offset)\n", namespace)
+        return namespace["decode"], unpacker, names
+
+    def decoder(self, address, length):
+        """Return (decode(target, buf, offset=0), struct, field names) for ``length`` bytes read at ``address``."""
+        key = (address, length)
+        compiled = self._decoders.get(key)
+        if compiled is None:
+            compiled = self._decoders[key] = self._compile(address, length)
+        return compiled
+
+    def decode_into(self, target, address, buf):
+        """Decode every schema field contained in ``buf`` (read from ``address``) onto ``target``."""
+        decode, _, names = self.decoder(address, len(buf))
+        if decode is not None:
+            decode(target, buf)
+        return names
+
+    def decode(self, address, buf):
+        """Return {field name: value} for the schema fields contained in ``buf``."""
+        _, unpacker, names = self.decoder(address, len(buf))
+        if unpacker is None:
+            return {}
+        return dict(zip(names, unpacker.unpack_from(buf)))
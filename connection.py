@@ -1,164 +1,316 @@
 import serial
-from client import build_empty_read_frame
+from client import build_empty_read_frame, build_registers_read_frame, build_registers_write_frame
 from protocol import (
-    ACK_LENGTH,
-    ETX,
-    STX,
     ACK,
     NACK,
     READY,
-    ACK_EMPTY_LENGTH,
-    READY_LENGTH,
-    NACK_LENGTH,
-    FRAME_ETX_END_POS,
-    FRAME_OP_POS,
     FRAME_LEN_LSB_POS,
     FRAME_LEN_MSB_POS,
-    FRAME_PROTOCOL_OVERHEAD,
-    FRAME_PROTOCOL_PREFIX_LEN,
+    FRAME_OP_POS,
     OPERATION_READ,
-    OPERATION_WRITE
+    OPERATION_WRITE,
+    FrameDecoder,
+    process_frame,
 )
+from metrics import METRICS
+from registers import REGISTERS_PAGE_SIZE
+import tracing
 import time
 import sys
 
 
+BAUDRATE = 115200
+PING_TIMEOUT = 0.05
+RESPONSE_TIMEOUT_NS = 1_000_000_000
+# Idle time after which the module is assumed to be asleep again. Guessing too
+# long is safe: a sleeping module answers READY and the request is retried.
+SLEEP_TIMEOUT = 0.5
+
+# Why a request has to be retried after waking the module
+_ASLEEP = "asleep"
+_TIMEOUT = "timeout"
+
+
 def _print_error(msg: str):
     print(f"ERROR: {msg}", file=sys.stderr)
 
 
-def ping_module(port):
-    try:
-        with serial.Serial(port, 115200, timeout=0.05) as ser:
-            frame = build_empty_read_frame()
-            ser.write(frame)
-            receiving = True
-            found_frame = False
-            response_bytes = []
-            count = 0
-            expected_length = 0
-            start_time = time.time_ns()
-            while receiving:
-                resp = ser.read(1)
-                byte = resp[0] if resp else None
-                if not byte:
-                    receiving = False
-                    break
-                if byte == STX:
-                    found_frame = True
-
-                if found_frame:
-                    response_bytes.append(byte)
-                    count += 1
-
-                    if count == 2:
-                        if byte == ACK:
-                            expected_length = ACK_LENGTH
-                        elif byte == READY:
-                            expected_length = READY_LENGTH
-                        elif byte == NACK:
-                            expected_length = NACK_LENGTH
-                        else:
-                            _print_error(f"ping_module({port}) unexpected response op: 0x{byte:02X}")
-                            return False
-
-            # Got exactly the expected length and ETX
-            if (
-                expected_length > 0
-                and len(response_bytes) == expected_length
-                and response_bytes[-1 * FRAME_ETX_END_POS] == ETX
-            ):
-                if (
-                    response_bytes[FRAME_OP_POS] == ACK
-                    or response_bytes[FRAME_OP_POS] == READY
-                ):
-                    return True
-                elif response_bytes[FRAME_OP_POS] == NACK:
-                    _print_error(f"ping_module({port}) got NACK")
-                    return False
-
-            # Read too many bytes and still no ETX
-            if len(response_bytes) > expected_length:
-                _print_error(f"ping_module({port}) response too long (expected {expected_length}, got {len(response_bytes)})")
-                return False
-
-            # Timeout 1s
-            if (time.time_ns() - start_time) > 1_000_000_000:
-                _print_error(f"ping_module({port}) timeout")
-                return False
-
-            _print_error(f"ping_module({port}) no valid response")
+class Connection:
+    """One serial port kept open for the lifetime of the object.
+
+    The port is opened lazily on first use. If an exchange fails with a serial
+    error (e.g. the USB adapter was unplugged) the port is closed, reopened and
+    the exchange retried ``reconnect_attempts`` times before giving up.
+
+    The module counts as awake for ``sleep_timeout`` seconds after any answer,
+    so ``ping()`` only sends the wake frame when it may be asleep. A request
+    answered with READY (the module was asleep and only woke up, without
+    executing it) is resent once. A read that was not answered at all is resent
+    once after a wake ping; a write is not, since the module may have executed
+    it and only the ACK was lost. ``stats()`` reports the bus transactions and
+    the pings skipped and sent.
+
+    ``capture`` (a capture.CaptureWriter) records every byte written and read.
+    ``transport`` replaces the serial port with any object offering the pyserial
+    read/write/in_waiting/reset_input_buffer API, e.g. a capture.ReplaySerial.
+
+    Phase timings and error counts go to ``metrics`` (default: metrics.METRICS)
+    under this port; ``errors`` is the per-port counter of error kinds. With a
+    ``tracer`` (default: whatever tracing.TRACER is at the time, so tracing can be
+    started and stopped while the connection is open) every exchange is also
+    recorded as timeline spans on this port's track.
+    """
+
+    def __init__(self, port, baudrate=BAUDRATE, timeout=PING_TIMEOUT, reconnect_attempts=1,
+                 capture=None, transport=None, metrics=None, tracer=None, sleep_timeout=SLEEP_TIMEOUT):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnects = 0
+        self.sleep_timeout = sleep_timeout
+        self.transactions = 0
+        self.wake_pings = 0
+        self.pings_skipped = 0
+        self.rewakes = 0
+        self._awake_until_ns = 0
+        self.capture = capture
+        self._transport = transport
+        self._ser = None
+        self.metrics = METRICS if metrics is None else metrics
+        phase = self.metrics.phase
+        self._open_time = phase(port, "open")
+        self._ping_time = phase(port, "ping")
+        self._write_time = phase(port, "write")
+        self._first_byte_time = phase(port, "first_byte")
+        self._response_time = phase(port, "response")
+        self._decode_time = phase(port, "decode")
+        self.errors = self.metrics.errors(port)
+        self._written_ns = 0
+        self._tracer = tracer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def tracer(self):
+        return tracing.TRACER if self._tracer is None else self._tracer
+
+    @property
+    def awake(self):
+        """True while the module answered less than ``sleep_timeout`` ago."""
+        return time.perf_counter_ns() < self._awake_until_ns
+
+    @property
+    def is_open(self):
+        return self._ser is not None and self._ser.is_open
+
+    def open(self):
+        if not self.is_open:
+            if self._transport is not None:
+                self._ser = self._transport
+            else:
+                t0 = time.perf_counter_ns()
+                self._ser = serial.serial_for_url(self.port, self.baudrate, timeout=self.timeout)
+                self._open_time.record(time.perf_counter_ns() - t0)
+        return self._ser
+
+    def close(self):
+        ser, self._ser = self._ser, None
+        self._awake_until_ns = 0
+        if ser is not None:
+            try:
+                ser.close()
+            except (serial.SerialException, OSError):
+                pass
+
+    def _exchange(self, frame, receive, *, idempotent=True, resend=0, reason=None):
+        """Write ``frame`` and return ``receive(ser)``, reopening the port after a serial error.
+
+        The frame is written again on the reopened port only if it never went
+        out or it is ``idempotent`` (a read); otherwise the error is raised, as
+        the module may already have executed it. ``resend`` and ``reason`` (why
+        send_frame sends the frame again) are recorded on the trace spans.
+        """
+        attempts = self.reconnect_attempts + 1
+        for attempt in range(attempts):
+            sent = False
+            try:
+                ser = self.open()
+                # Drop anything left over from a previous, abandoned exchange
+                ser.reset_input_buffer()
+                t0 = time.perf_counter_ns()
+                self.transactions += 1
+                ser.write(frame)
+                sent = True
+                self._written_ns = time.perf_counter_ns()
+                self._write_time.record(self._written_ns - t0)
+                if self.capture is not None:
+                    self.capture.write(frame)
+                tracer = self.tracer
+                if tracer is None:
+                    return receive(ser)
+                result = receive(ser)
+                args = {"op": f"0x{frame[1]:02X}", "length": len(frame), "retry": resend, "reconnect": attempt}
+                if reason is not None:
+                    args["reason"] = reason
+                tracer.complete(self.port, "write", t0, self._written_ns, args)
+                tracer.complete(self.port, "receive", self._written_ns, time.perf_counter_ns(), args)
+                return result
+            except (serial.SerialException, OSError) as e:
+                self.errors["serial"] += 1
+                self.close()
+                if attempt + 1 >= attempts or (sent and not idempotent):
+                    raise serial.SerialException(e)
+                self.reconnects += 1
+                _print_error(f"{self.port} serial error: {e}, reconnecting")
+
+    # ------------------ Public API --------------------
+    def ping(self, force=False):
+        """Wake the module unless it is known to be awake (or ``force``). Return False on failure."""
+        if not force and self.awake:
+            self.pings_skipped += 1
+            return True
+        self.wake_pings += 1
+        t0 = time.perf_counter_ns()
+        try:
+            return self._exchange(build_empty_read_frame(), self._receive_ping)
+        except serial.SerialException as e:
+            _print_error(f"ping_module({self.port}) serial error: {e}")
             return False
+        finally:
+            end = time.perf_counter_ns()
+            self._ping_time.record(end - t0)
+            tracer = self.tracer
+            if tracer is not None:
+                tracer.complete(self.port, "ping", t0, end)
+
+    def send_frame(self, frame, operation):
+        empty_read = operation == OPERATION_READ and not (frame[FRAME_LEN_LSB_POS] | frame[FRAME_LEN_MSB_POS])
+        idempotent = operation == OPERATION_READ
+
+        def receive(ser):
+            return self._receive_response(ser, operation, empty_read)
+
+        try:
+            status, response, retry = self._exchange(frame, receive, idempotent=idempotent)
+            if retry is _TIMEOUT and operation != OPERATION_READ:
+                # Resending a write whose ACK was lost would execute it twice
+                # (e.g. trigger a second measurement)
+                return status, response
+            if retry is not None:
+                # The module was asleep (woken by this request) or did not answer a read
+                self.rewakes += 1
+                if retry is _TIMEOUT and not self.ping(force=True):
+                    return False, response
+                status, response, _ = self._exchange(frame, receive, idempotent=idempotent, resend=1, reason=retry)
+            return status, response
+        except serial.SerialException:
+            return False, []
+
+    def stats(self):
+        """Bus transaction counts of this connection."""
+        return {
+            "transactions": self.transactions,
+            "wake_pings": self.wake_pings,
+            "pings_skipped": self.pings_skipped,
+            "rewakes": self.rewakes,
+            "reconnects": self.reconnects,
+            "errors": dict(self.errors),
+        }
+
+    def read_registers(self, address=0x0000, length=REGISTERS_PAGE_SIZE):
+        """Return the register payload read from ``address`` or None on failure."""
+        status, frame = self.send_frame(build_registers_read_frame(address, length), OPERATION_READ)
+        if not status:
+            return None
+        return self.process_response(frame, length)
+
+    def process_response(self, frame, length):
+        """process_frame() a read response, timing it and counting CRC and short-page errors."""
+        t0 = time.perf_counter_ns()
+        payload = process_frame(frame)
+        end = time.perf_counter_ns()
+        self._decode_time.record(end - t0)
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.complete(self.port, "decode", t0, end, {"length": len(frame)})
+        if payload is None:
+            self.errors["crc"] += 1
+        elif len(payload) < length:
+            self.errors["short_page"] += 1
+        return payload
 
-    except (serial.SerialException, serial.SerialTimeoutException) as e:
-        _print_error(f"ping_module({port}) serial error: {e}")
-        return False
+    def write_registers(self, address, data):
+        status, _ = self.send_frame(build_registers_write_frame(address, data), OPERATION_WRITE)
+        return status
+
+    # ------------------ Receive loops --------------------
+    def _receive_frame(self, ser, decoder):
+        """Bulk-read into ``decoder`` until it yields a frame or the response deadline passes."""
+        deadline = time.monotonic_ns() + RESPONSE_TIMEOUT_NS
+        first_byte = True
+        while True:
+            chunk = ser.read(ser.in_waiting or decoder.missing)
+            if chunk:
+                if first_byte:
+                    self._first_byte_time.record(time.perf_counter_ns() - self._written_ns)
+                    first_byte = False
+                if self.capture is not None:
+                    self.capture.read(chunk)
+                frames = decoder.feed(chunk)
+                if frames:
+                    # Any answer, even READY from a sleeping module, leaves it awake
+                    self._awake_until_ns = self._written_ns + int(self.sleep_timeout * 1e9)
+                    self._response_time.record(time.perf_counter_ns() - self._written_ns)
+                    if decoder.bad_etx:
+                        self.errors["bad_etx"] += decoder.bad_etx
+                    return frames[0]
+            elif time.monotonic_ns() > deadline:
+                self._awake_until_ns = 0
+                self.errors["timeout"] += 1
+                if decoder.bad_etx:
+                    self.errors["bad_etx"] += decoder.bad_etx
+                return None
+
+    def _receive_ping(self, ser):
+        port = self.port
+        frame = self._receive_frame(ser, FrameDecoder())
+        if frame is None:
+            _print_error(f"ping_module({port}) timeout")
+            return False
+        if frame[FRAME_OP_POS] == NACK:
+            self.errors["nack"] += 1
+            _print_error(f"ping_module({port}) got NACK")
+            return False
+        return True
+
+    def _receive_response(self, ser, operation, empty_read):
+        """Return (status, frame or pending bytes, retry reason or None)."""
+        decoder = FrameDecoder(operation)
+        frame = self._receive_frame(ser, decoder)
+        if frame is None:
+            return False, decoder.pending, _TIMEOUT
+        op = frame[FRAME_OP_POS]
+        if op == NACK:
+            self.errors["nack"] += 1
+            return False, frame, None
+        if op == READY and not empty_read:
+            # Only the empty read is answered with READY by an awake module
+            return False, frame, _ASLEEP
+        return op in (ACK, READY), frame, None
+
+
+# Single-shot helpers kept for scripts that only need one exchange; they open
+# and close the port on every call, prefer a long-lived Connection instead.
+def ping_module(port):
+    with Connection(port, timeout=PING_TIMEOUT) as conn:
+        return conn.ping()
 
 
 def send_frame(port, frame, operation):
-    try:
-        with serial.Serial(port, 115200, timeout=0.1) as ser:
-            ser.write(frame)
-
-            response_bytes = []
-            expected_length = 0
-            op_code = None
-            found_frame = False
-            start_time = time.time_ns()
-
-            while True:
-                resp = ser.read(1)
-                if not resp:
-                    if (time.time_ns() - start_time) > 1_000_000_000:
-                        return False, response_bytes
-                    continue
-
-                byte = resp[0]
-
-                # Find start of frame
-                if not found_frame:
-                    if byte != STX:
-                        continue
-                    found_frame = True
-                    response_bytes = [byte]
-                    continue
-
-                response_bytes.append(byte)
-
-                # Determine op code and initial expected length
-                if len(response_bytes) == 2:
-                    op_code = byte
-                    if op_code == NACK:
-                        expected_length = NACK_LENGTH
-                    elif op_code == ACK:
-                        if operation == OPERATION_READ:
-                            expected_length = ACK_EMPTY_LENGTH
-                        if operation == OPERATION_WRITE:
-                            expected_length = 5
-                    elif op_code == READY:
-                        expected_length = READY_LENGTH
-                    else:
-                        # Unknown response op
-                        expected_length = 0
-
-                # If ACK and we have the length bytes, adjust expected length for data payload
-                if op_code == ACK and len(response_bytes) >= FRAME_PROTOCOL_PREFIX_LEN and operation == OPERATION_READ:
-                    frame_length = response_bytes[FRAME_LEN_LSB_POS] | (
-                        response_bytes[FRAME_LEN_MSB_POS] << 8
-                    )
-                    if frame_length > 0:
-                        expected_length = FRAME_PROTOCOL_OVERHEAD + frame_length
-                    else:
-                        expected_length = ACK_EMPTY_LENGTH
-                
-                # When we have enough bytes, verify ETX and decide
-                if expected_length and len(response_bytes) >= expected_length:
-                    if response_bytes[-1] != ETX:
-                        return False, response_bytes
-                    if op_code == ACK or op_code == READY:
-                        return True, response_bytes
-                    if op_code == NACK:
-                        return False, response_bytes
-                    return False, response_bytes
-    except (serial.SerialException, serial.SerialTimeoutException):
-        return False, []
+    with Connection(port, timeout=0.1, reconnect_attempts=0) as conn:
+        return conn.send_frame(frame, operation)
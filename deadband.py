@@ -0,0 +1,90 @@
+"""Deadband (change-only) logging stage.
+
+DeadbandLogger sits between decoding and any logger with a ``log(module, ts)``
+method (CsvLogger, BinaryStore) and only passes on readings that changed::
+
+    with CsvLogger(compression="gzip") as csv_logger:
+        logger = DeadbandLogger(csv_logger, heartbeat=60.0)
+        scheduler = AcquisitionScheduler(conn, logger=logger)
+
+A reading is written when, compared with the last reading *written* for that
+module, a float field moved by more than its tolerance (exact comparison for
+a float field without one), any other field changed at all, or ``heartbeat``
+seconds have passed. Reconstruction error
+bound: holding each written row until the next one (zero-order hold)
+reproduces every dropped reading to within the field tolerance, integer
+fields (status, control, ids, versions) exactly, and no value is older than
+``heartbeat`` seconds while the module keeps being read.
+"""
+import math
+from datetime import datetime
+
+from logger import module_values
+
+# Default absolute tolerances, around the sensors' noise level
+DEFAULT_TOLERANCES = {
+    "concentration": 0.01,
+    "temperature": 0.05,
+    "humidity": 0.2,
+}
+# Positions of the float fields in logger.module_values()
+_VALUE_INDEX = {"concentration": 7, "temperature": 8, "humidity": 9}
+
+
+class DeadbandLogger:
+    """Forward only readings that changed beyond the per-field tolerances to ``logger``."""
+
+    def __init__(self, logger, tolerances=None, *, heartbeat=60.0):
+        self.logger = logger
+        self.tolerances = dict(DEFAULT_TOLERANCES if tolerances is None else tolerances)
+        self.heartbeat = heartbeat
+        self.samples = 0
+        self.written = 0
+        unknown = set(self.tolerances) - set(_VALUE_INDEX)
+        if unknown:
+            raise ValueError(f"unknown tolerance fields: {', '.join(sorted(unknown))}")
+        # Tolerance per position in module_values(); None compares exactly
+        self._tolerance = [None] * (max(_VALUE_INDEX.values()) + 1)
+        for name, i in _VALUE_INDEX.items():
+            self._tolerance[i] = self.tolerances.get(name, 0.0)
+        self._last = {}  # module_id -> (datetime, values) of the last written reading
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _changed(self, previous, values):
+        for old, new, tolerance in zip(previous, values, self._tolerance):
+            if tolerance is None:
+                if old != new:
+                    return True
+            elif math.isnan(old) or math.isnan(new):
+                if math.isnan(old) != math.isnan(new):
+                    return True
+            elif abs(new - old) > tolerance:
+                return True
+        return False
+
+    def log(self, module, ts=None):
+        if ts is None:
+            ts = datetime.now()
+        self.samples += 1
+        values = module_values(module)
+        last = self._last.get(module.module_id)
+        if last is not None:
+            last_ts, previous = last
+            if (ts - last_ts).total_seconds() < self.heartbeat and not self._changed(previous, values):
+                return
+        self._last[module.module_id] = (ts, values)
+        self.written += 1
+        self.logger.log(module, ts)
+
+    @property
+    def reduction(self):
+        """Readings seen per reading written."""
+        return self.samples / self.written if self.written else 0.0
+
+    def close(self):
+        self.logger.close()
@@ -0,0 +1,137 @@
+import copy
+import threading
+import time
+
+from connection import Connection
+from measurement import MeasurementWaiter, run_measurement
+from module import Module, CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+
+
+class DeviceSchedule:
+    """Which measurements to run on ``port`` and how often (seconds, None = never)."""
+
+    def __init__(self, port, *, sht40_interval=1.0, o2_interval=None):
+        self.port = port
+        self.sht40_interval = sht40_interval
+        self.o2_interval = o2_interval
+
+    def intervals(self):
+        return [
+            (control_bit, interval)
+            for control_bit, interval in (
+                (CONTROL_SHT40_MEASUREMENT_SET, self.sht40_interval),
+                (CONTROL_MEASUREMENT_SET, self.o2_interval),
+            )
+            if interval is not None
+        ]
+
+
+class DeviceState:
+    def __init__(self, port):
+        self.port = port
+        self.module = None
+        self.timestamp = None
+        self.readings = 0
+        self.errors = 0
+        self.callback_errors = 0
+        self.last_error = None
+
+
+class FleetPoller:
+    """Poll many modules concurrently, one thread and one Connection per port.
+
+    A slow or dead module only delays its own thread. ``on_reading(port, module)``
+    is called from the device thread after every successful measurement with a
+    private copy of the Module. Exceptions from a measurement or from
+    ``on_reading`` are logged and counted in the device state; the device keeps
+    being polled.
+    """
+
+    def __init__(self, schedules, *, wait_for_completion=True, retry_interval=1.0, on_reading=None):
+        self.schedules = list(schedules)
+        self.wait_for_completion = wait_for_completion
+        self.retry_interval = retry_interval
+        self.on_reading = on_reading
+        self._states = {s.port: DeviceState(s.port) for s in self.schedules}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._stop.clear()
+        for schedule in self.schedules:
+            t = threading.Thread(target=self._run_device, args=(schedule,), name=f"fleet-{schedule.port}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def results(self):
+        """Snapshot of the latest state of every device, keyed by port."""
+        with self._lock:
+            return {port: copy.copy(state) for port, state in self._states.items()}
+
+    def _record(self, port, module=None, error=None, callback_error=False):
+        with self._lock:
+            state = self._states[port]
+            if callback_error:
+                state.callback_errors += 1
+                state.last_error = error
+            elif error is None:
+                state.module = module
+                state.timestamp = time.time()
+                state.readings += 1
+            else:
+                state.errors += 1
+                state.last_error = error
+
+    def _run_device(self, schedule):
+        port = schedule.port
+        module = Module()
+        intervals = dict(schedule.intervals())
+        next_due = {control_bit: time.monotonic() for control_bit in intervals}
+        if not next_due:
+            return
+        with Connection(port) as conn:
+            waiter = MeasurementWaiter(conn) if self.wait_for_completion else None
+            while not self._stop.is_set():
+                control_bit = min(next_due, key=next_due.get)
+                delay = next_due[control_bit] - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                try:
+                    if not conn.ping():
+                        error = "ping failed"
+                    elif not run_measurement(conn, module, control_bit, waiter):
+                        error = "measurement failed"
+                    else:
+                        error = None
+                except Exception as e:
+                    error = f"measurement raised {e!r}"
+                if error is None:
+                    snapshot = copy.copy(module)
+                    self._record(port, snapshot)
+                    if self.on_reading:
+                        try:
+                            self.on_reading(port, snapshot)
+                        except Exception as e:
+                            print(f"ERROR: on_reading raised {e!r} on {port}")
+                            self._record(port, error=f"on_reading raised {e!r}", callback_error=True)
+                    next_due[control_bit] += intervals[control_bit]
+                    # Do not try to catch up on a backlog after a stall
+                    next_due[control_bit] = max(next_due[control_bit], time.monotonic())
+                else:
+                    print(f"ERROR: {error} on {port}")
+                    self._record(port, error=error)
+                    next_due[control_bit] = time.monotonic() + self.retry_interval
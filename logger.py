@@ -0,0 +1,204 @@
+import csv
+import gzip
+import io
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import tracing
+from metrics import METRICS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_HEADER = [
+    "timestamp",
+    "module_id",
+    "register_map_version",
+    "firmware_version",
+    "status",
+    "control",
+    "concentration",
+    "temperature",
+    "humidity",
+]
+
+
+def module_values(module):
+    """Raw values of one log row, cheap to take on the acquisition thread."""
+    return (
+        module.module_id,
+        module.register_map_ver_major,
+        module.register_map_ver_minor,
+        module.firmware_ver_major,
+        module.firmware_ver_minor,
+        module.status,
+        module.control,
+        module.concentration,
+        module.temperature,
+        module.humidity,
+    )
+
+
+def format_log_row(ts, values):
+    """CSV row for ``values`` (see module_values) taken at datetime ``ts``."""
+    (module_id, map_major, map_minor, fw_major, fw_minor,
+     status, control, concentration, temperature, humidity) = values
+    return [
+        ts.isoformat(timespec="seconds"),
+        module_id,
+        f"{map_major}.{map_minor}",
+        f"{fw_major}.{fw_minor}",
+        f"0x{status:02X}",
+        f"0x{control:02X}",
+        f"{concentration:.6f}",
+        f"{temperature:.6f}",
+        f"{humidity:.6f}",
+    ]
+
+
+_STOP = object()
+
+# Log file suffix per compression
+COMPRESSION_SUFFIX = {None: ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+
+
+def _segment_path(logs_dir, ts, suffix):
+    """First unused ``logs_dir/YYYY-MM-DD-N<suffix>`` for the day of ``ts``."""
+    n = 1
+    while (logs_dir / f"{ts:%Y-%m-%d}-{n}{suffix}").exists():
+        n += 1
+    return logs_dir / f"{ts:%Y-%m-%d}-{n}{suffix}"
+
+
+def _open_log(path, compression):
+    """Open ``path`` for CSV text: appending when plain, as a new file when compressed."""
+    if compression is None:
+        return path.open("a", newline="", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, "xt", newline="", encoding="utf-8")
+    raw = path.open("xb")
+    return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8", newline="")
+
+
+class CsvLogger:
+    """Append rows to ``logs_dir/YYYY-MM-DD.csv`` from a background writer thread.
+
+    ``log()`` only queues the row values. The writer keeps the daily file open,
+    flushes after ``flush_rows`` rows or ``flush_interval`` seconds, whichever
+    comes first, and switches to a new file when a row belongs to the next day.
+    ``close()`` drains the queue and flushes. If the queue is full, ``log()``
+    drops the row and counts it in ``dropped`` rather than blocking acquisition.
+    Each batch write is timed as the "log_write" phase of ``metrics`` and, while
+    tracing is on, recorded as a span on the logger's own track.
+    With ``compression`` ("gzip", or "zstd" with the zstandard package) every
+    run writes its own segment file per day, ``YYYY-MM-DD-N.csv.gz``/``.csv.zst``
+    with the next free N, so a crash can only truncate the end of its own
+    segment and never a stream that a later run appends to.
+    """
+
+    def __init__(self, logs_dir="logs", *, flush_rows=256, flush_interval=1.0, max_queue=100_000,
+                 metrics=None, compression=None):
+        if compression not in COMPRESSION_SUFFIX:
+            raise ValueError(f"unknown compression {compression!r}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.logs_dir = Path(logs_dir)
+        self.compression = compression
+        self._write_time = (METRICS if metrics is None else metrics).phase(str(logs_dir), "log_write")
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._file = None
+        self._writer = None
+        self._day_start = None
+        self._day_end = None
+        self._thread = threading.Thread(target=self._run, name="csv-logger", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def log(self, module, ts=None):
+        try:
+            self._queue.put_nowait((ts or datetime.now(), module_values(module)))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    # ------------------ Writer thread --------------------
+    def _open(self, ts):
+        self._close_file()
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        if self.compression is None:
+            path = self.logs_dir / f"{ts:%Y-%m-%d}.csv"
+        else:
+            path = _segment_path(self.logs_dir, ts, COMPRESSION_SUFFIX[self.compression])
+        new_file = not path.exists()
+        self._file = _open_log(path, self.compression)
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(LOG_HEADER)
+        self._day_start = datetime.combine(ts.date(), datetime.min.time())
+        self._day_end = self._day_start + timedelta(days=1)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _write(self, batch):
+        t0 = time.perf_counter_ns()
+        for ts, values in batch:
+            if self._file is None or not self._day_start <= ts < self._day_end:
+                self._open(ts)
+            self._writer.writerow(format_log_row(ts, values))
+        self._file.flush()
+        self.rows_written += len(batch)
+        end = time.perf_counter_ns()
+        self._write_time.record(end - t0)
+        tracer = tracing.TRACER
+        if tracer is not None:
+            tracer.complete(f"csv {self.logs_dir}", "log_write", t0, end, {"rows": len(batch)})
+
+    def _run(self):
+        batch = []
+        batch_started = 0.0
+        stopping = False
+        while not stopping:
+            timeout = None
+            if batch:
+                timeout = max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    if not batch:
+                        batch_started = time.monotonic()
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if batch and (stopping or len(batch) >= self.flush_rows
+                          or time.monotonic() - batch_started >= self.flush_interval):
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    print(f"ERROR: Failed to write log rows: {e}")
+                    self._close_file()
+                batch = []
+        self._close_file()
@@ -0,0 +1,133 @@
+import statistics
+import time
+from collections import deque
+
+from client import plan_register_reads
+from module import CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+
+MEASUREMENT_NAMES = {
+    CONTROL_MEASUREMENT_SET: "o2",
+    CONTROL_SHT40_MEASUREMENT_SET: "sht40",
+}
+
+# Fixed waits used when completion is not polled
+FIXED_WAIT = {
+    CONTROL_MEASUREMENT_SET: 0.25,
+    CONTROL_SHT40_MEASUREMENT_SET: 0.05,
+}
+
+# Single small read covering REG_CONTROL..REG_STATUS
+POLL_ADDRESS, POLL_LENGTH = plan_register_reads(["control", "status"])[0]
+
+
+class MeasurementWaiter:
+    """Wait for a triggered measurement by polling REG_CONTROL/REG_STATUS.
+
+    A measurement is done once the device clears its bit in REG_CONTROL. The
+    first poll is scheduled just before the completion time learned from the
+    last ``history`` measurements of that kind, then the poll interval doubles
+    from ``min_poll`` up to ``max_poll``. ``deadline`` bounds the whole wait.
+    """
+
+    def __init__(self, conn, *, deadline=2.0, history=16, min_poll=0.002, max_poll=0.05, lead=0.8):
+        self.conn = conn
+        self.deadline = deadline
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.lead = lead
+        self._history = history
+        self._durations = {}
+        self._polls = {}
+        self._timeouts = {}
+
+    def expected_duration(self, control_bit):
+        durations = self._durations.get(control_bit)
+        if not durations:
+            return None
+        return statistics.median(durations)
+
+    def wait(self, module, control_bit, started=None):
+        """Block until ``control_bit`` clears; update ``module`` status/control. Return False on deadline."""
+        if started is None:
+            started = time.monotonic()
+        deadline = started + self.deadline
+        expected = self.expected_duration(control_bit)
+        next_poll = started + (self.lead * expected if expected else self.min_poll)
+        interval = self.min_poll
+        while True:
+            delay = next_poll - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._polls[control_bit] = self._polls.get(control_bit, 0) + 1
+            data = self.conn.read_registers(POLL_ADDRESS, POLL_LENGTH)
+            now = time.monotonic()
+            if data is not None and len(data) >= POLL_LENGTH:
+                module.deserialize_range(POLL_ADDRESS, data)
+                if not module.control & control_bit:
+                    self._record(control_bit, now - started)
+                    return True
+            if now + interval > deadline:
+                self._timeouts[control_bit] = self._timeouts.get(control_bit, 0) + 1
+                return False
+            next_poll = now + interval
+            interval = min(interval * 2, self.max_poll)
+
+    def _record(self, control_bit, duration):
+        durations = self._durations.get(control_bit)
+        if durations is None:
+            durations = self._durations[control_bit] = deque(maxlen=self._history)
+        durations.append(duration)
+
+    def timing(self):
+        """Learned completion timing per measurement kind, for monitoring."""
+        stats = {}
+        for control_bit, name in MEASUREMENT_NAMES.items():
+            durations = self._durations.get(control_bit, ())
+            stats[name] = {
+                "samples": len(durations),
+                "expected_s": self.expected_duration(control_bit),
+                "last_s": durations[-1] if durations else None,
+                "polls": self._polls.get(control_bit, 0),
+                "timeouts": self._timeouts.get(control_bit, 0),
+            }
+        return stats
+
+
+def wait_for_measurement(conn, module, control_bit, waiter=None, started=None):
+    """Wait for a triggered measurement (polled with ``waiter`` or fixed sleep), timed as the "wait" phase."""
+    if started is None:
+        started = time.monotonic()
+    t0 = time.perf_counter_ns()
+    if waiter:
+        done = waiter.wait(module, control_bit, started)
+    else:
+        time.sleep(FIXED_WAIT[control_bit])
+        done = True
+    end = time.perf_counter_ns()
+    conn.metrics.phase(conn.port, "wait").record(end - t0)
+    tracer = conn.tracer
+    if tracer is not None:
+        tracer.complete(conn.port, "wait", t0, end,
+                        {"kind": MEASUREMENT_NAMES[control_bit], "polled": bool(waiter), "done": done})
+    return done
+
+
+def read_fields(conn, module, fields=None):
+    """Read the planned register ranges for ``fields`` into ``module``. Return False on any failed read."""
+    for address, length in plan_register_reads(fields):
+        data = conn.read_registers(address, length)
+        if data is None or len(data) < length:
+            return False
+        module.deserialize_range(address, data)
+    return True
+
+
+def run_measurement(conn, module, control_bit, waiter=None, fields=None):
+    """Trigger ``control_bit``, wait for it (polled with ``waiter`` or fixed sleep) and read ``fields``."""
+    module.control = control_bit
+    addr, data = module.serialize_control()
+    if not conn.write_registers(addr, data):
+        return False
+    if not wait_for_measurement(conn, module, control_bit, waiter):
+        return False
+    return read_fields(conn, module, fields)
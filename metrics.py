@@ -0,0 +1,172 @@
+"""Per-phase latency histograms and error counters in Prometheus text format.
+
+Connections record into the process-wide ``METRICS`` registry by default::
+
+    METRICS.serve(("127.0.0.1", 9464))        # http://127.0.0.1:9464/metrics
+    METRICS.write_textfile("/var/lib/node_exporter/faradayox.prom")
+
+Histograms are log-linear (HDR style): values are kept in integer nanoseconds
+in buckets whose width is at most 1/16 of their lower bound, so recording is a
+bit_length() and a list increment and percentiles are within ~6%. Each
+histogram is written by the one thread that owns the port, without locking.
+"""
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_MAX_BUCKETS = 64 * SUB_BUCKETS
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Phases recorded by Connection and the measurement/log helpers
+PHASES = ("open", "ping", "write", "first_byte", "response", "decode", "wait", "log_write")
+# Error kinds counted per port
+ERROR_KINDS = ("timeout", "nack", "bad_etx", "crc", "short_page", "serial", "stale")
+
+
+def _bucket_index(ns):
+    shift = ns.bit_length() - SUB_BUCKET_BITS - 1
+    if shift <= 0:
+        return ns
+    return shift * SUB_BUCKETS + (ns >> shift)
+
+
+def _bucket_upper(index):
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift = index // SUB_BUCKETS - 1
+    return (index - shift * SUB_BUCKETS + 1) << shift
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * _MAX_BUCKETS
+        self.count = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        self.counts[min(_bucket_index(ns), _MAX_BUCKETS - 1)] += 1
+        self.count += 1
+        self.sum_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        """Upper bound (ns) of the bucket holding the ``q`` quantile, capped at the maximum seen."""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(_bucket_upper(index), self.max_ns)
+        return self.max_ns
+
+
+def _escape(value):
+    """Escape a label value as the exposition format requires (backslash, quote, newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class Metrics:
+    """Registry of phase histograms and error counters, keyed by serial port."""
+
+    def __init__(self, prefix="faradayox"):
+        self.prefix = prefix
+        self._phases = {}  # (port, phase) -> Histogram
+        self._errors = {}  # port -> Counter of error kinds
+        self._lock = threading.Lock()
+
+    def phase(self, port, phase):
+        """Histogram for ``phase`` on ``port``; callers keep it to record without a lookup."""
+        key = (port, phase)
+        histogram = self._phases.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._phases.setdefault(key, Histogram())
+        return histogram
+
+    def errors(self, port):
+        """Counter of error kinds for ``port``; increment with ``errors[kind] += 1``."""
+        counter = self._errors.get(port)
+        if counter is None:
+            with self._lock:
+                counter = self._errors.setdefault(port, Counter())
+        return counter
+
+    def render(self):
+        """Prometheus text exposition of all phases (as summaries, in seconds) and error counters."""
+        prefix = self.prefix
+        with self._lock:
+            phases = sorted(self._phases.items())
+            errors = sorted(self._errors.items())
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent per acquisition phase.",
+            f"# TYPE {prefix}_phase_seconds summary",
+        ]
+        for (port, phase), h in phases:
+            labels = _labels(port=port, phase=phase)
+            for q in QUANTILES:
+                lines.append(f'{prefix}_phase_seconds{{{labels},quantile="{q}"}} {h.percentile(q) / 1e9:.9f}')
+            lines.append(f"{prefix}_phase_seconds_sum{{{labels}}} {h.sum_ns / 1e9:.9f}")
+            lines.append(f"{prefix}_phase_seconds_count{{{labels}}} {h.count}")
+        lines += [
+            f"# HELP {prefix}_phase_max_seconds Longest duration seen per acquisition phase.",
+            f"# TYPE {prefix}_phase_max_seconds gauge",
+        ]
+        for (port, phase), h in phases:
+            lines.append(f"{prefix}_phase_max_seconds{{{_labels(port=port, phase=phase)}}} {h.max_ns / 1e9:.9f}")
+        lines += [
+            f"# HELP {prefix}_errors_total Bus errors by kind.",
+            f"# TYPE {prefix}_errors_total counter",
+        ]
+        for port, counter in errors:
+            for kind in ERROR_KINDS:
+                lines.append(f"{prefix}_errors_total{{{_labels(port=port, kind=kind)}}} {counter[kind]}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write ``render()`` to ``path`` (node_exporter textfile collector)."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, address=("127.0.0.1", 9464)):
+        """Serve ``/metrics`` over HTTP from a daemon thread; return the server (``shutdown()`` to stop)."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(address, Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
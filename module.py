@@ -1,22 +1,74 @@
 import struct
-from registers import Registers, REGISTERS_PAGE_SIZE
+from codec import RegisterCodec
+from registers import Registers, REGISTERS_PAGE_SIZE, REGISTER_FIELDS, REGISTER_SCHEMA, VOLATILE_FIELDS, WRITABLE_FIELDS
+
+# REG_CONTROL bits; the device clears a measurement bit once that sequence is done
+CONTROL_MEASUREMENT_SET = 0x01
+CONTROL_SHT40_MEASUREMENT_SET = 0x02
+CONTROL_STORE_SETTINGS = 0x04
+
+
+_F32 = struct.Struct("<f")
+
+
+# Float properties keep their quantized value in a private slot
+_FIELD_STORAGE = {
+    "concentration": "_concentration",
+    "temperature": "_temperature",
+    "humidity": "_humidity",
+}
+
+
+_FIELD_FORMATS = {name: struct.Struct("<" + fmt) for name, _, fmt in REGISTER_SCHEMA}
+
+# 1 for every register byte belonging to a VOLATILE_FIELDS entry
+_VOLATILE = bytearray(REGISTERS_PAGE_SIZE)
+for _name in VOLATILE_FIELDS:
+    _start, _length = REGISTER_FIELDS[_name]
+    _VOLATILE[_start:_start + _length] = b"\x01" * _length
+# 1 for every register byte belonging to a WRITABLE_FIELDS entry
+_WRITABLE = bytearray(REGISTERS_PAGE_SIZE)
+for _name in WRITABLE_FIELDS:
+    _start, _length = REGISTER_FIELDS[_name]
+    _WRITABLE[_start:_start + _length] = b"\x01" * _length
+_ONES = memoryview(b"\x01" * REGISTERS_PAGE_SIZE)
+
+# Register shadow state; not register fields, so kept out of the slot loop in __init__
+_SHADOW_SLOTS = ("_shadow", "_known", "_staged", "_dirty")
 
 
 class Module:
+    """Decoded register values of one module plus a shadow of its register page.
+
+    The shadow holds the bytes last read from or written to the device. Values
+    staged with ``stage()``/``stage_registers()`` are only sent by a flush
+    (see writes.py), which merges adjacent staged bytes into one write frame
+    and drops bytes the device is known to hold already.
+    """
+
+    # One slot per register schema field, so a new register only needs a schema entry
+    __slots__ = tuple(_FIELD_STORAGE.get(name, name) for name, _, _ in REGISTER_SCHEMA) + _SHADOW_SLOTS
+
     def __init__(self):
-        # Required simple byte fields
-        self.register_map_ver_minor = 0
-        self.register_map_ver_major = 0
-        self.status = 0
-        self.control = 0
-        self.firmware_ver_minor = 0
-        self.firmware_ver_major = 0
+        for slot in self.__slots__[:-len(_SHADOW_SLOTS)]:
+            setattr(self, slot, 0)
+        self._shadow = bytearray(REGISTERS_PAGE_SIZE)
+        self._known = bytearray(REGISTERS_PAGE_SIZE)
+        self._staged = bytearray(REGISTERS_PAGE_SIZE)
+        self._dirty = bytearray(REGISTERS_PAGE_SIZE)
         # Float (32-bit) sensor values
         self._concentration = 0.0
         self._temperature = 0.0
         self._humidity = 0.0
-        # Device id (u32)
-        self.module_id = 0
+
+    def __copy__(self):
+        """Copy with its own register shadow and staged writes."""
+        other = type(self).__new__(type(self))
+        for slot in self.__slots__[:-len(_SHADOW_SLOTS)]:
+            setattr(other, slot, getattr(self, slot))
+        for slot in _SHADOW_SLOTS:
+            setattr(other, slot, bytearray(getattr(self, slot)))
+        return other
 
     def __str__(self):
         fields = [
@@ -32,6 +84,18 @@ class Module:
         w = max(len(n) for n, _ in fields)
         return "\n".join(f"{n:<{w}} : {v}" for n, v in fields)
 
+    def to_dict(self):
+        return {
+            "module_id": self.module_id,
+            "register_map_version": f"{self.register_map_ver_major}.{self.register_map_ver_minor}",
+            "firmware_version": f"{self.firmware_ver_major}.{self.firmware_ver_minor}",
+            "status": self.status,
+            "control": self.control,
+            "concentration": self.concentration,
+            "temperature": self.temperature,
+            "humidity": self.humidity,
+        }
+
     # ------------- 32-bit float quantization & properties -------------
     @staticmethod
     def _as_f32(value):
@@ -40,7 +104,7 @@ class Module:
             f = float(0.0 if value is None else value)
         except Exception:
             f = 0.0
-        return struct.unpack('<f', struct.pack('<f', f))[0]
+        return _F32.unpack(_F32.pack(f))[0]
 
     def _get_concentration(self): return self._concentration
     def _set_concentration(self, v): self._concentration = self._as_f32(v)
@@ -56,59 +120,79 @@ class Module:
 
     # Removed other properties (pressure, gain, zero_offset, calibration values etc.)
 
-    # --------------------- Helpers ---------------------
-    @staticmethod
-    def _u16(data, lo, hi):
-        return data[lo] | (data[hi] << 8)
-
-    @staticmethod
-    def _u32(data, b0, b1, b2, b3):
-        return data[b0] | (data[b1] << 8) | (data[b2] << 16) | (data[b3] << 24)
-
-    @staticmethod
-    def _f32(data, b0, b1, b2, b3):
-        return struct.unpack("<f", bytes([data[b0], data[b1], data[b2], data[b3]]))[0]
-
     # ------------------ Public API --------------------
     def deserialize(self, data):
         if len(data) < REGISTERS_PAGE_SIZE:
             return False
-        self.register_map_ver_minor = data[Registers.REG_MAP_VER_LSB]
-        self.register_map_ver_major = data[Registers.REG_MAP_VER_MSB]
-        self.control = data[Registers.REG_CONTROL]
-        self.status = data[Registers.REG_STATUS]
-        self.firmware_ver_minor = data[Registers.REG_FIRMWARE_VER_LSB]
-        self.firmware_ver_major = data[Registers.REG_FIRMWARE_VER_MSB]
-        self.concentration = self._f32(
-            data,
-            Registers.REG_CONCENTRATION_LLSB,
-            Registers.REG_CONCENTRATION_LMSB,
-            Registers.REG_CONCENTRATION_MLSB,
-            Registers.REG_CONCENTRATION_MMSB,
-        )
-        self.temperature = self._f32(
-            data,
-            Registers.REG_TEMPERATURE_LLSB,
-            Registers.REG_TEMPERATURE_LMSB,
-            Registers.REG_TEMPERATURE_MLSB,
-            Registers.REG_TEMPERATURE_MMSB,
-        )
-        self.humidity = self._f32(
-            data,
-            Registers.REG_HUMIDITY_LLSB,
-            Registers.REG_HUMIDITY_LMSB,
-            Registers.REG_HUMIDITY_MLSB,
-            Registers.REG_HUMIDITY_MMSB,
-        )
-        self.module_id = self._u32(
-            data,
-            Registers.REG_DEVICE_ID_LLSB,
-            Registers.REG_DEVICE_ID_LMSB,
-            Registers.REG_DEVICE_ID_MLSB,
-            Registers.REG_DEVICE_ID_MMSB,
-        )
+        _CODEC.decode_into(self, 0x0000, data)
+        self._shadow[:] = data[:REGISTERS_PAGE_SIZE]
+        self._known[:] = _ONES
         return True
 
+    def deserialize_range(self, address, data):
+        """Update the fields fully contained in ``data`` read from ``address``; return their names."""
+        end = address + len(data)
+        if end <= REGISTERS_PAGE_SIZE:
+            self._shadow[address:end] = data
+            self._known[address:end] = _ONES[:len(data)]
+        return _CODEC.decode_into(self, address, data)
+
+    # ------------------ Staged writes --------------------
+    def stage(self, name, value):
+        """Set schema field ``name`` to ``value`` and stage its registers for the next flush."""
+        setattr(self, name, value)
+        self.stage_registers(REGISTER_FIELDS[name][0], _FIELD_FORMATS[name].pack(getattr(self, name)))
+
+    def stage_registers(self, address, data):
+        """Stage raw register bytes ``data`` at ``address`` for the next flush."""
+        end = address + len(data)
+        if address < 0 or end > REGISTERS_PAGE_SIZE:
+            raise ValueError(f"registers 0x{address:02X}+{len(data)} outside the register page")
+        self._staged[address:end] = data
+        self._dirty[address:end] = _ONES[:len(data)]
+
+    def dirty_writes(self, merge_gap=0):
+        """Return the [(address, bytes)] write frames for the staged registers.
+
+        Staged bytes equal to the shadow of a non-volatile register are no-ops
+        and are dropped. The rest are merged into contiguous runs; runs up to
+        ``merge_gap`` bytes apart are joined by rewriting the known values of
+        the registers between them, but only if all of those are writable
+        (WRITABLE_FIELDS) and non-volatile. Read-only and unmapped registers
+        are never rewritten.
+        """
+        staged, shadow, known, dirty = self._staged, self._shadow, self._known, self._dirty
+        runs = []
+        address = dirty.find(1)
+        while address >= 0:
+            if known[address] and not _VOLATILE[address] and staged[address] == shadow[address]:
+                dirty[address] = 0
+            elif runs and (address == runs[-1][1] or (
+                    address - runs[-1][1] <= merge_gap and self._rewritable(runs[-1][1], address))):
+                runs[-1][1] = address + 1
+            else:
+                runs.append([address, address + 1])
+            address = dirty.find(1, address + 1)
+        return [
+            (start, bytes(staged[i] if dirty[i] else shadow[i] for i in range(start, end)))
+            for start, end in runs
+        ]
+
+    def _rewritable(self, start, end):
+        known = self._known
+        return all(known[i] and _WRITABLE[i] and not _VOLATILE[i] for i in range(start, end))
+
+    def mark_written(self, address, data):
+        """Record that the device acknowledged ``data`` written at ``address``."""
+        end = address + len(data)
+        self._shadow[address:end] = data
+        self._known[address:end] = _ONES[:len(data)]
+        self._dirty[address:end] = bytes(len(data))
+
+    @property
+    def has_staged_writes(self):
+        return self._dirty.find(1) >= 0
+
     # Removed serialization/control helpers not needed for simple read-only client
     # ---- Minimal control helpers (reintroduced for measurement sequencing) ----
     def serialize_control(self):
@@ -116,10 +200,15 @@ class Module:
         return Registers.REG_CONTROL, [int(self.control) & 0xFF]
 
     def control_start_measurement_set(self):
-        self.control = 0x01  # oxygen measurement sequence
+        self.control = CONTROL_MEASUREMENT_SET  # oxygen measurement sequence
 
     def control_start_sht40_measurement_set(self):
-        self.control = 0x02  # temperature/humidity measurement sequence
+        self.control = CONTROL_SHT40_MEASUREMENT_SET  # temperature/humidity measurement sequence
 
     def control_store_settings_to_flash(self):
-        self.control = 0x04  # optional retained for compatibility
+        self.control = CONTROL_STORE_SETTINGS  # optional retained for compatibility
+
+
+# Decoded float32 values are already single precision: store them in the backing
+# slots directly instead of re-quantizing through the property setters.
+_CODEC = RegisterCodec(storage=_FIELD_STORAGE)
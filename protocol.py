@@ -24,6 +24,7 @@ ACK_EMPTY_LENGTH = 9
 READY_LENGTH = 5
 NACK_LENGTH = 6
 ACK_LENGTH = 5
+FRAME_MAX_DATA_LEN = 256  # one register page
 
 
 _CRC16_TABLE = [
@@ -51,7 +52,7 @@ _CRC16_TABLE = [
     0x2E93,0x3EB2,0x0ED1,0x1EF0,
 ]
 
-def _crc16_ccitt_false(data_bytes):
+def _crc16_ccitt_false_table(data_bytes):
     crc = 0xFFFF
     for b in data_bytes:
         idx = ((crc >> 8) ^ b) & 0xFF
@@ -59,21 +60,35 @@ def _crc16_ccitt_false(data_bytes):
     return crc & 0xFFFF
 
 
+try:
+    # CRC-CCITT-FALSE is CRC-CCITT (XModem) seeded with 0xFFFF
+    from binascii import crc_hqx as _crc_hqx
+except ImportError:
+    _crc_hqx = None
+
+
+def _crc16_ccitt_false(data_bytes):
+    if _crc_hqx is None:
+        return _crc16_ccitt_false_table(data_bytes)
+    if not isinstance(data_bytes, (bytes, bytearray, memoryview)):
+        data_bytes = bytes(data_bytes)
+    return _crc_hqx(data_bytes, 0xFFFF)
+
+
 def build_frame(operation, address, data, data_len):
     # Construct frame without CRC/ETX first
-    frame = [
+    frame = bytearray((
         STX,
         operation,
         address & 0xFF,
         (address >> 8) & 0xFF,
         data_len & 0xFF,
         (data_len >> 8) & 0xFF,
-    ]
+    ))
     if operation == OPERATION_WRITE and data_len > 0:
-        frame.extend(data)
+        frame += bytes(data)
     # Compute CRC over everything after STX up to last data byte
-    crc_region = frame[1:]
-    crc16 = _crc16_ccitt_false(crc_region)
+    crc16 = _crc16_ccitt_false(memoryview(frame)[1:])
     frame.append(crc16 & 0xFF)      # CRC LSB
     frame.append((crc16 >> 8) & 0xFF)  # CRC MSB
     frame.append(ETX)
@@ -81,6 +96,7 @@ def build_frame(operation, address, data, data_len):
 
 
 def process_frame(frame):
+    """Validate a response frame and return its payload as a memoryview into ``frame``."""
     # Basic structure checks
     if not frame or frame[0] != STX or frame[-1] != ETX:
         return None
@@ -92,15 +108,96 @@ def process_frame(frame):
         # Allow callers to still attempt if device sent READY/ACK without payload (handled elsewhere)
         if len(frame) < expected_len:
             return None
+    if not isinstance(frame, (bytes, bytearray, memoryview)):
+        frame = bytes(frame)
+    view = memoryview(frame)
     # Extract CRC (just before ETX)
     crc_lsb_index = -3
     crc_msb_index = -2
-    crc_received = frame[crc_lsb_index] | (frame[crc_msb_index] << 8)
+    crc_received = view[crc_lsb_index] | (view[crc_msb_index] << 8)
     # Compute CRC over OP..data
-    crc_region_end = len(frame) - 3  # exclude CRC(2) + ETX
-    crc_calc = _crc16_ccitt_false(frame[1:crc_region_end])
+    crc_region_end = len(view) - 3  # exclude CRC(2) + ETX
+    crc_calc = _crc16_ccitt_false(view[1:crc_region_end])
     if crc_calc != crc_received:
         return None
-    # Return payload
-    data = frame[FRAME_DATA_POS:FRAME_DATA_POS + data_len] if data_len else []
-    return data
+    # Return payload without copying
+    return view[FRAME_DATA_POS:FRAME_DATA_POS + data_len]
+
+
+class FrameDecoder:
+    """Incremental decoder for device response frames.
+
+    Feed it whatever chunks the port returns; it keeps the bytes in a bytearray,
+    resyncs on STX, uses OP (and LEN for read ACKs) to know the frame length and
+    returns complete frames ending in ETX. CRC is left to ``process_frame``.
+    ``operation`` is the request operation the responses belong to, or None for
+    the empty-read wake ping whose ACK is a short frame. ``bad_etx`` counts
+    frame candidates dropped because they did not end in ETX.
+    """
+
+    def __init__(self, operation=None):
+        self.operation = operation
+        self.bad_etx = 0
+        self._buf = bytearray()
+
+    @property
+    def pending(self):
+        return bytes(self._buf)
+
+    @property
+    def missing(self):
+        """Minimum number of bytes still needed to complete the next frame."""
+        expected = self._expected_length()
+        if expected <= 0:
+            # No response is shorter than READY; a read ACK needs its LEN field first
+            expected = READY_LENGTH if len(self._buf) < 2 else FRAME_PROTOCOL_PREFIX_LEN
+        return max(1, expected - len(self._buf))
+
+    def reset(self):
+        self._buf.clear()
+
+    def _expected_length(self):
+        # 0 = not known yet, -1 = not a valid frame start
+        buf = self._buf
+        if len(buf) < 2:
+            return 0
+        op = buf[FRAME_OP_POS]
+        if op == NACK:
+            return NACK_LENGTH
+        if op == READY:
+            return READY_LENGTH
+        if op != ACK:
+            return -1
+        if self.operation != OPERATION_READ:
+            return ACK_LENGTH
+        if len(buf) < FRAME_PROTOCOL_PREFIX_LEN:
+            return 0
+        data_len = buf[FRAME_LEN_LSB_POS] | (buf[FRAME_LEN_MSB_POS] << 8)
+        if data_len > FRAME_MAX_DATA_LEN:
+            return -1
+        return FRAME_PROTOCOL_OVERHEAD + data_len
+
+    def feed(self, chunk):
+        """Append ``chunk`` and return the list of frames completed by it."""
+        buf = self._buf
+        buf += chunk
+        frames = []
+        while buf:
+            start = buf.find(STX)
+            if start < 0:
+                buf.clear()
+                break
+            if start:
+                del buf[:start]
+            expected = self._expected_length()
+            if expected < 0 or (0 < expected <= len(buf) and buf[expected - 1] != ETX):
+                # Not a frame after all, resync on the next STX
+                if expected > 0:
+                    self.bad_etx += 1
+                del buf[:1]
+                continue
+            if expected == 0 or len(buf) < expected:
+                break
+            frames.append(bytes(buf[:expected]))
+            del buf[:expected]
+        return frames
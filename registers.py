@@ -1,3 +1,4 @@
+import struct
 from enum import IntEnum
 
 
@@ -34,3 +35,50 @@ class Registers(IntEnum):
 
 REGISTERS_PAGE_SIZE = Registers.REG_LAST  # still 256 bytes for full-page reads
 
+
+
+# Register schema: (Module field, first register, struct format). Add registers
+# here (e.g. pressure or calibration values) and both the codec and the read
+# planner pick them up.
+REGISTER_SCHEMA = (
+    ("register_map_ver_minor", Registers.REG_MAP_VER_LSB, "B"),
+    ("register_map_ver_major", Registers.REG_MAP_VER_MSB, "B"),
+    ("firmware_ver_minor", Registers.REG_FIRMWARE_VER_LSB, "B"),
+    ("firmware_ver_major", Registers.REG_FIRMWARE_VER_MSB, "B"),
+    ("control", Registers.REG_CONTROL, "B"),
+    ("status", Registers.REG_STATUS, "B"),
+    ("concentration", Registers.REG_CONCENTRATION_LLSB, "f"),
+    ("temperature", Registers.REG_TEMPERATURE_LLSB, "f"),
+    ("humidity", Registers.REG_HUMIDITY_LLSB, "f"),
+    ("module_id", Registers.REG_DEVICE_ID_LLSB, "I"),
+)
+
+# Fields that are only meaningful together
+REGISTER_GROUPS = {
+    "register_map_version": ("register_map_ver_minor", "register_map_ver_major"),
+    "firmware_version": ("firmware_ver_minor", "firmware_ver_major"),
+}
+
+
+def _field_ranges():
+    fields = {name: (int(register), struct.calcsize("<" + fmt)) for name, register, fmt in REGISTER_SCHEMA}
+    for group, members in REGISTER_GROUPS.items():
+        start = min(fields[m][0] for m in members)
+        end = max(fields[m][0] + fields[m][1] for m in members)
+        fields[group] = (start, end - start)
+    return fields
+
+
+# Register range (first register, length in bytes) of every schema field and group
+REGISTER_FIELDS = _field_ranges()
+
+# Fields read by default: everything Module decodes
+DEFAULT_READ_FIELDS = tuple(name for name, _, _ in REGISTER_SCHEMA)
+
+# Fields the device changes by itself: a value read earlier says nothing about
+# the register now, so writes to them are never skipped as no-ops
+VOLATILE_FIELDS = ("control", "status", "concentration", "temperature", "humidity")
+
+# Fields the host may write; add configuration registers here. Everything else
+# (versions, status, sensor values, module_id, unmapped registers) is read-only
+WRITABLE_FIELDS = ("control",)
@@ -0,0 +1,151 @@
+import threading
+import time
+from datetime import datetime
+
+from client import plan_register_reads
+from measurement import MEASUREMENT_NAMES, wait_for_measurement
+from module import Module, CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+
+
+class AcquisitionScheduler:
+    """Run measurements on one connection at fixed rates until stopped.
+
+    Deadlines are ``start + n * interval`` on the monotonic clock, so sleep
+    jitter and cycle time never accumulate into drift. A measurement starting
+    more than ``late_tolerance`` (fraction of its interval) after its deadline
+    counts as late; deadlines that passed entirely are skipped and counted.
+
+    Work is pipelined: the registers of a reading are only fetched raw, and are
+    decoded, logged and handed to ``on_reading(module)`` while the device is
+    busy with the next measurement (or before idling until the next deadline).
+    """
+
+    def __init__(self, conn, *, sht40_interval=1.0, o2_interval=10.0, waiter=None, logger=None,
+                 on_reading=None, fields=None, late_tolerance=0.1):
+        self.conn = conn
+        self.intervals = {
+            control_bit: interval
+            for control_bit, interval in (
+                (CONTROL_SHT40_MEASUREMENT_SET, sht40_interval),
+                (CONTROL_MEASUREMENT_SET, o2_interval),
+            )
+            if interval
+        }
+        self.waiter = waiter
+        self.logger = logger
+        self.on_reading = on_reading
+        self.late_tolerance = late_tolerance
+        self.module = Module()
+        self._plan = plan_register_reads(fields)
+        self._scratch = Module()
+        self._pending = None
+        self._stop = threading.Event()
+        self._completed_span = {}  # control_bit -> [first, last] deadline of completed measurements
+        self._counts = {
+            control_bit: {"completed": 0, "failed": 0, "late": 0, "skipped": 0, "max_lateness_s": 0.0}
+            for control_bit in self.intervals
+        }
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------ Acquisition steps --------------------
+    def _trigger(self, control_bit):
+        self._scratch.control = control_bit
+        addr, data = self._scratch.serialize_control()
+        return self.conn.write_registers(addr, data)
+
+    def _read_raw(self):
+        parts = []
+        for address, length in self._plan:
+            data = self.conn.read_registers(address, length)
+            if data is None or len(data) < length:
+                return None
+            parts.append((address, data))
+        return parts
+
+    def _process_pending(self):
+        if self._pending is None:
+            return
+        ts, parts = self._pending
+        self._pending = None
+        for address, data in parts:
+            self.module.deserialize_range(address, data)
+        if self.logger:
+            self.logger.log(self.module, ts)
+        if self.on_reading:
+            self.on_reading(self.module)
+
+    def _measure(self, control_bit):
+        if not self.conn.ping() or not self._trigger(control_bit):
+            return False
+        started = time.monotonic()
+        # Device is busy measuring: finish the previous reading meanwhile
+        self._process_pending()
+        if not wait_for_measurement(self.conn, self._scratch, control_bit, self.waiter, started):
+            return False
+        parts = self._read_raw()
+        if parts is None:
+            return False
+        self._pending = (datetime.now(), parts)
+        return True
+
+    # ------------------ Scheduling --------------------
+    def run(self, duration=None):
+        """Acquire until ``stop()`` is called or ``duration`` seconds have passed."""
+        if not self.intervals:
+            return
+        self._stop.clear()
+        start = time.monotonic()
+        self._completed_span = {}
+        end = None if duration is None else start + duration
+        index = {control_bit: 0 for control_bit in self.intervals}
+        try:
+            while not self._stop.is_set():
+                control_bit = min(index, key=lambda b: index[b] * self.intervals[b])
+                interval = self.intervals[control_bit]
+                deadline = start + index[control_bit] * interval
+                if end is not None and deadline >= end:
+                    break
+                if deadline > time.monotonic():
+                    self._process_pending()
+                    if self._stop.wait(max(0.0, deadline - time.monotonic())):
+                        break
+                counts = self._counts[control_bit]
+                lateness = time.monotonic() - deadline
+                if lateness >= interval:
+                    # Whole periods passed while busy: skip them instead of bursting to catch up
+                    skipped = int(lateness // interval)
+                    counts["skipped"] += skipped
+                    index[control_bit] += skipped
+                    lateness -= skipped * interval
+                if lateness > self.late_tolerance * interval:
+                    counts["late"] += 1
+                counts["max_lateness_s"] = max(counts["max_lateness_s"], lateness)
+                if self._measure(control_bit):
+                    counts["completed"] += 1
+                    scheduled = start + index[control_bit] * interval
+                    self._completed_span.setdefault(control_bit, [scheduled, scheduled])[1] = scheduled
+                else:
+                    counts["failed"] += 1
+                    print(f"ERROR: {MEASUREMENT_NAMES[control_bit]} measurement failed on {self.conn.port}")
+                index[control_bit] += 1
+        finally:
+            self._process_pending()
+
+    def stats(self):
+        """Per measurement kind: target and achieved rate, completed/failed/late/skipped counts.
+
+        The achieved rate counts the periods between the first and the last
+        completed measurement, so a full run at the target rate reports exactly
+        the target and skipped or failed periods lower it.
+        """
+        stats = {}
+        for control_bit, counts in self._counts.items():
+            first, last = self._completed_span.get(control_bit, (0.0, 0.0))
+            stats[MEASUREMENT_NAMES[control_bit]] = dict(
+                counts,
+                target_hz=1.0 / self.intervals[control_bit],
+                achieved_hz=(counts["completed"] - 1) / (last - first) if last > first else 0.0,
+            )
+        return stats
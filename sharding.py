@@ -0,0 +1,263 @@
+"""Multi-process fleet: serial ports sharded across worker processes.
+
+Each worker runs a FleetPoller for its share of the ports and publishes every
+decoded reading into a shared-memory table with one row per module and one
+column per register field (plus sequence, reading and error counters). The
+parent reads the latest values straight from that table, without pickling or
+copying between processes, and restarts workers that die or stop sending
+heartbeats::
+
+    with ShardedFleet(DeviceSchedule(p) for p in ports) as fleet:
+        time.sleep(10)
+        print(fleet.latest())
+
+Rows are written under a per-row sequence lock: the writer makes ``seq`` odd
+while updating, so readers retry any row whose ``seq`` was odd or changed
+while they copied it. When a worker dies, the supervisor makes the ``seq`` of
+its rows even again before restarting it, so a row it left half written does
+not block readers. Needs numpy; workers are started with "spawn".
+"""
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch import PAGE_DTYPE
+from fleet import FleetPoller
+from module import Module
+from registers import REGISTER_SCHEMA
+
+FIELD_NAMES = tuple(name for name, _, _ in REGISTER_SCHEMA)
+SLOT_DTYPE = np.dtype(
+    [("seq", "<u4"), ("readings", "<u4"), ("errors", "<u4"), ("timestamp", "<f8")]
+    + [(name, PAGE_DTYPE.fields[name][0]) for name in FIELD_NAMES],
+    align=True,
+)
+WORKER_DTYPE = np.dtype([("pid", "<i8"), ("heartbeat", "<f8"), ("restarts", "<u4"), ("stop", "<u4")], align=True)
+HEARTBEAT_INTERVAL = 0.5
+
+
+def _tables(buf, n_slots, n_workers):
+    slots = np.ndarray((n_slots,), SLOT_DTYPE, buffer=buf)
+    workers = np.ndarray((n_workers,), WORKER_DTYPE, buffer=buf, offset=n_slots * SLOT_DTYPE.itemsize)
+    return slots, workers
+
+
+def publish(slots, index, module, ts=None):
+    """Write ``module`` into row ``index`` under its sequence lock (one writer per row)."""
+    row = slots[index:index + 1]
+    # Odd whatever the row was left at, so readers never take this write as done
+    seq = int(row["seq"][0]) | 1
+    row["seq"] = seq
+    row["readings"] += 1
+    row["timestamp"] = time.time() if ts is None else ts
+    for name in FIELD_NAMES:
+        row[name] = getattr(module, name)
+    row["seq"] = (seq + 1) & 0xFFFFFFFF
+
+
+def _snapshot(slots, retries):
+    """Copy of ``slots`` and the indexes of rows still caught half written after ``retries``."""
+    snapshot = slots.copy()
+    torn = np.flatnonzero((snapshot["seq"] & 1) | (snapshot["seq"] != slots["seq"]))
+    for _ in range(retries):
+        if not len(torn):
+            break
+        time.sleep(0)
+        snapshot[torn] = slots[torn]
+        torn = np.flatnonzero((snapshot["seq"] & 1) | (snapshot["seq"] != slots["seq"]))
+    return snapshot, torn
+
+
+def read_consistent(slots, retries=100):
+    """Copy of ``slots`` in which no row was caught half written.
+
+    Raises RuntimeError if some row is still being written after ``retries``
+    attempts (its writer is stuck mid-publish).
+    """
+    snapshot, torn = _snapshot(slots, retries)
+    if len(torn):
+        raise RuntimeError(f"rows {torn.tolist()} still being written after {retries} retries")
+    return snapshot
+
+
+def release_rows(slots, rows):
+    """Make the ``seq`` of ``rows`` even again after their writer died, possibly mid-publish."""
+    seq = slots["seq"][rows]
+    slots["seq"][rows] = seq + (seq & 1)
+
+
+def module_from_row(row):
+    module = Module()
+    for name in FIELD_NAMES:
+        setattr(module, name, row[name].item())
+    return module
+
+
+def _worker(shm_name, n_slots, n_workers, worker_index, shard, wait_for_completion):
+    # Workers share the parent's resource tracker, so attaching does not make
+    # them responsible for unlinking the segment
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        slots, workers = _tables(shm.buf, n_slots, n_workers)
+        slot_of = {schedule.port: slot for slot, schedule in shard}
+        parent = os.getppid()
+
+        def on_reading(port, module):
+            publish(slots, slot_of[port], module)
+
+        poller = FleetPoller((schedule for _, schedule in shard), wait_for_completion=wait_for_completion,
+                             on_reading=on_reading)
+        workers["pid"][worker_index] = os.getpid()
+        with poller:
+            while not workers["stop"][worker_index] and os.getppid() == parent:
+                time.sleep(HEARTBEAT_INTERVAL)
+                workers["heartbeat"][worker_index] = time.time()
+                for port, state in poller.results().items():
+                    slots["errors"][slot_of[port]] = state.errors
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # still referenced by a device thread; the process is exiting anyway
+
+
+class ShardedFleet:
+    """Poll ``schedules`` (fleet.DeviceSchedule) from ``workers`` processes.
+
+    Ports are assigned round-robin. ``on_reading(port, module)`` is called in
+    the parent, from the supervisor thread, for the latest reading of every
+    port that has a new one since the last check (intermediate readings of a
+    fast port may be skipped). A worker whose process died or whose heartbeat
+    is older than ``stall_timeout`` is restarted with the same ports.
+    """
+
+    def __init__(self, schedules, *, workers=None, wait_for_completion=True, on_reading=None,
+                 supervise_interval=0.2, stall_timeout=10.0, start_method="spawn"):
+        self.schedules = list(schedules)
+        self.ports = [s.port for s in self.schedules]
+        self.n_workers = max(1, min(workers or os.cpu_count() or 1, len(self.schedules)))
+        self.wait_for_completion = wait_for_completion
+        self.on_reading = on_reading
+        self.supervise_interval = supervise_interval
+        self.stall_timeout = stall_timeout
+        self._ctx = multiprocessing.get_context(start_method)
+        self._shards = [
+            [(slot, self.schedules[slot]) for slot in range(w, len(self.schedules), self.n_workers)]
+            for w in range(self.n_workers)
+        ]
+        self._shm = None
+        self._slots = None
+        self._workers = None
+        self._processes = [None] * self.n_workers
+        self._supervisor = None
+        self._stopping = threading.Event()
+        self._seen = np.zeros(len(self.schedules), np.uint32)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        size = len(self.schedules) * SLOT_DTYPE.itemsize + self.n_workers * WORKER_DTYPE.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._slots, self._workers = _tables(self._shm.buf, len(self.schedules), self.n_workers)
+        self._slots[:] = 0
+        self._workers[:] = 0
+        self._stopping.clear()
+        for w in range(self.n_workers):
+            self._spawn(w)
+        self._supervisor = threading.Thread(target=self._supervise, name="fleet-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def stop(self, timeout=5.0):
+        if self._shm is None:
+            return
+        self._stopping.set()
+        self._supervisor.join()
+        # A flag in the shared table rather than a multiprocessing.Event: a
+        # worker killed while waiting on the Event would leave its lock held
+        self._workers["stop"] = 1
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        release_rows(self._slots, np.arange(len(self._slots)))
+        self._deliver()
+        self._slots = self._workers = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def _spawn(self, w):
+        self._workers["heartbeat"][w] = time.time()
+        self._workers["stop"][w] = 0
+        process = self._ctx.Process(
+            target=_worker,
+            args=(self._shm.name, len(self.schedules), self.n_workers, w, self._shards[w],
+                  self.wait_for_completion),
+            name=f"fleet-worker-{w}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[w] = process
+
+    def _supervise(self):
+        while not self._stopping.wait(self.supervise_interval):
+            now = time.time()
+            for w, process in enumerate(self._processes):
+                stalled = now - self._workers["heartbeat"][w] > self.stall_timeout
+                if process.is_alive() and not stalled:
+                    continue
+                ports = ", ".join(s.port for _, s in self._shards[w])
+                print(f"ERROR: fleet worker {w} ({ports}) {'stalled' if stalled else 'died'}, restarting")
+                if process.is_alive():
+                    process.kill()
+                process.join()
+                release_rows(self._slots, [slot for slot, _ in self._shards[w]])
+                self._workers["restarts"][w] += 1
+                self._spawn(w)
+            self._deliver()
+
+    def _deliver(self):
+        if self.on_reading is None:
+            return
+        # A row still being written is delivered on a later pass
+        snapshot, torn = _snapshot(self._slots, retries=100)
+        fresh = snapshot["readings"] != self._seen
+        fresh[torn] = False
+        for slot in np.flatnonzero(fresh):
+            self._seen[slot] = snapshot["readings"][slot]
+            self.on_reading(self.ports[slot], module_from_row(snapshot[slot]))
+
+    # ------------------ Results --------------------
+    def table(self):
+        """Consistent copy of the shared table: one SLOT_DTYPE row per port, in ``ports`` order."""
+        return read_consistent(self._slots)
+
+    def latest(self):
+        """{port: reading dict with timestamp, readings and errors} for every port with a reading."""
+        snapshot = self.table()
+        latest = {}
+        for port, row in zip(self.ports, snapshot):
+            if not row["readings"]:
+                continue
+            reading = module_from_row(row).to_dict()
+            reading.update(timestamp=row["timestamp"].item(), readings=row["readings"].item(),
+                           errors=row["errors"].item())
+            latest[port] = reading
+        return latest
+
+    def worker_stats(self):
+        return [
+            {"pid": int(row["pid"]), "alive": process.is_alive(), "restarts": int(row["restarts"]),
+             "ports": [s.port for _, s in shard]}
+            for row, process, shard in zip(self._workers, self._processes, self._shards)
+        ]
@@ -0,0 +1,266 @@
+"""Simulated FaradayOx modules on Linux pseudo-terminals.
+
+Each SimulatedModule implements the device side of protocol.py on a 256-byte
+register page; a Simulator serves any number of them from one thread, each on
+its own pty whose slave path is passed to Connection like a real port::
+
+    with Simulator() as sim:
+        port = sim.add(SimulatedModule(module_id=1, o2_time=0.05))
+        cli_app(port=port)
+"""
+import heapq
+import os
+import random
+import selectors
+import struct
+import threading
+import time
+
+from protocol import (
+    ACK,
+    ETX,
+    NACK,
+    READY,
+    STX,
+    FRAME_DATA_POS,
+    FRAME_LEN_LSB_POS,
+    FRAME_LEN_MSB_POS,
+    FRAME_ADDR_LSB_POS,
+    FRAME_ADDR_MSB_POS,
+    FRAME_OP_POS,
+    FRAME_PROTOCOL_OVERHEAD,
+    FRAME_PROTOCOL_PREFIX_LEN,
+    OPERATION_READ,
+    OPERATION_WRITE,
+    _crc16_ccitt_false,
+)
+from registers import REGISTERS_PAGE_SIZE, Registers
+from module import CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+
+NACK_BAD_CRC = 0x01
+NACK_BAD_RANGE = 0x02
+NACK_BAD_OPERATION = 0x03
+
+
+class SimulatedModule:
+    """Protocol and register behaviour of one module, independent of any I/O.
+
+    ``latency`` delays every response, ``sht40_time``/``o2_time`` are the
+    measurement durations (an O2 sequence includes an SHT40 one). ``drop_rate``
+    drops individual response bytes and ``corrupt_rate`` corrupts the CRC of a
+    response. With ``sleep_timeout`` set, the module falls asleep after that
+    much idle time and answers the next request with READY without executing it.
+    """
+
+    def __init__(self, module_id=0x00000001, *, latency=0.0, sht40_time=0.01, o2_time=0.2,
+                 drop_rate=0.0, corrupt_rate=0.0, sleep_timeout=None, seed=None):
+        self.latency = latency
+        self.sht40_time = sht40_time
+        self.o2_time = o2_time
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.sleep_timeout = sleep_timeout
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._pending = []  # (due, control_bit)
+        self._last_request = None
+        self.registers = bytearray(REGISTERS_PAGE_SIZE)
+        self.registers[Registers.REG_MAP_VER_LSB] = 0
+        self.registers[Registers.REG_MAP_VER_MSB] = 1
+        self.registers[Registers.REG_FIRMWARE_VER_LSB] = 0
+        self.registers[Registers.REG_FIRMWARE_VER_MSB] = 1
+        struct.pack_into("<I", self.registers, Registers.REG_DEVICE_ID_LLSB, module_id)
+        self._set_f32(Registers.REG_CONCENTRATION_LLSB, 20.9)
+        self._set_f32(Registers.REG_TEMPERATURE_LLSB, 22.0)
+        self._set_f32(Registers.REG_HUMIDITY_LLSB, 45.0)
+
+    def _set_f32(self, register, value):
+        struct.pack_into("<f", self.registers, register, value)
+
+    # ------------------ Measurements --------------------
+    def _start_measurement(self, control, now):
+        if control & CONTROL_MEASUREMENT_SET:
+            self._pending.append((now + self.sht40_time + self.o2_time, CONTROL_MEASUREMENT_SET))
+        if control & CONTROL_SHT40_MEASUREMENT_SET:
+            self._pending.append((now + self.sht40_time, CONTROL_SHT40_MEASUREMENT_SET))
+
+    def update(self, now):
+        """Finish the measurements due by ``now``."""
+        if not self._pending:
+            return
+        still_pending = []
+        for due, control_bit in self._pending:
+            if due > now:
+                still_pending.append((due, control_bit))
+                continue
+            self._set_f32(Registers.REG_TEMPERATURE_LLSB, self._rng.gauss(22.0, 0.2))
+            self._set_f32(Registers.REG_HUMIDITY_LLSB, self._rng.gauss(45.0, 0.5))
+            if control_bit == CONTROL_MEASUREMENT_SET:
+                self._set_f32(Registers.REG_CONCENTRATION_LLSB, self._rng.gauss(20.9, 0.05))
+            self.registers[Registers.REG_CONTROL] &= ~control_bit & 0xFF
+        self._pending = still_pending
+
+    # ------------------ Protocol --------------------
+    @staticmethod
+    def _finish(frame):
+        crc = _crc16_ccitt_false(memoryview(frame)[FRAME_OP_POS:])
+        frame += bytes([crc & 0xFF, crc >> 8, ETX])
+        return bytes(frame)
+
+    def _short(self, op):
+        return self._finish(bytearray([STX, op]))
+
+    def _nack(self, code):
+        return self._finish(bytearray([STX, NACK, code]))
+
+    def _data(self, address, length):
+        frame = bytearray([STX, ACK, address & 0xFF, address >> 8, length & 0xFF, length >> 8])
+        frame += self.registers[address:address + length]
+        return self._finish(frame)
+
+    def handle(self, request, now):
+        """Return the response bytes for one complete request frame."""
+        self.requests += 1
+        self.update(now)
+        asleep = (
+            self.sleep_timeout is not None
+            and (self._last_request is None or now - self._last_request > self.sleep_timeout)
+        )
+        self._last_request = now
+        if asleep:
+            return self._short(READY)
+        crc = request[-3] | (request[-2] << 8)
+        if _crc16_ccitt_false(memoryview(request)[FRAME_OP_POS:-3]) != crc:
+            return self._nack(NACK_BAD_CRC)
+        op = request[FRAME_OP_POS]
+        address = request[FRAME_ADDR_LSB_POS] | (request[FRAME_ADDR_MSB_POS] << 8)
+        length = request[FRAME_LEN_LSB_POS] | (request[FRAME_LEN_MSB_POS] << 8)
+        if address + length > REGISTERS_PAGE_SIZE:
+            return self._nack(NACK_BAD_RANGE)
+        if op == OPERATION_READ:
+            if length == 0:
+                return self._short(READY)
+            return self._data(address, length)
+        if op == OPERATION_WRITE:
+            self.registers[address:address + length] = request[FRAME_DATA_POS:FRAME_DATA_POS + length]
+            if address <= Registers.REG_CONTROL < address + length:
+                self._start_measurement(self.registers[Registers.REG_CONTROL], now)
+            return self._short(ACK)
+        return self._nack(NACK_BAD_OPERATION)
+
+    def inject_faults(self, response):
+        """Apply the configured CRC corruption and byte drops to ``response``."""
+        if self.corrupt_rate and self._rng.random() < self.corrupt_rate:
+            response = bytearray(response)
+            response[-3] ^= 0xFF
+            response = bytes(response)
+        if self.drop_rate:
+            response = bytes(b for b in response if self._rng.random() >= self.drop_rate)
+        return response
+
+
+def split_requests(buf):
+    """Remove and return the complete request frames at the front of ``buf`` (a bytearray)."""
+    requests = []
+    while True:
+        start = buf.find(STX)
+        if start < 0:
+            buf.clear()
+            return requests
+        del buf[:start]
+        if len(buf) < FRAME_PROTOCOL_PREFIX_LEN:
+            return requests
+        length = buf[FRAME_LEN_LSB_POS] | (buf[FRAME_LEN_MSB_POS] << 8)
+        total = FRAME_PROTOCOL_OVERHEAD + (length if buf[FRAME_OP_POS] == OPERATION_WRITE else 0)
+        if len(buf) < total:
+            return requests
+        if buf[total - 1] != ETX:
+            del buf[:1]
+            continue
+        requests.append(bytes(buf[:total]))
+        del buf[:total]
+
+
+class Simulator:
+    """Serve SimulatedModules on ptys from a single background thread."""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._devices = {}  # master fd -> (module, slave fd, rx buffer)
+        self._outgoing = []  # heap of (due, seq, master fd, bytes)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = os.pipe()
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._running = False
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def add(self, module):
+        """Attach ``module`` to a new pty and return the port path to open."""
+        master, slave = os.openpty()
+        os.set_blocking(master, False)
+        with self._lock:
+            self._devices[master] = (module, slave, bytearray())
+            self._selector.register(master, selectors.EVENT_READ)
+        if self._running:
+            os.write(self._wake_w, b"\0")
+        return os.ttyname(slave)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        os.write(self._wake_w, b"\0")
+        if self._thread:
+            self._thread.join(timeout=2)
+        for master, (_, slave, _) in self._devices.items():
+            self._selector.unregister(master)
+            os.close(master)
+            os.close(slave)
+        self._devices.clear()
+        self._selector.unregister(self._wake_r)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._selector.close()
+
+    def _run(self):
+        while self._running:
+            timeout = None
+            if self._outgoing:
+                timeout = max(0.0, self._outgoing[0][0] - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                if key.fd == self._wake_r:
+                    os.read(self._wake_r, 64)
+                    continue
+                self._receive(key.fd)
+            now = time.monotonic()
+            while self._outgoing and self._outgoing[0][0] <= now:
+                _, _, master, data = heapq.heappop(self._outgoing)
+                try:
+                    os.write(master, data)
+                except OSError:
+                    pass
+
+    def _receive(self, master):
+        with self._lock:
+            module, _, buf = self._devices[master]
+        try:
+            buf += os.read(master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        for request in split_requests(buf):
+            now = time.monotonic()
+            response = module.inject_faults(module.handle(request, now))
+            if response:
+                self._seq += 1
+                heapq.heappush(self._outgoing, (now + module.latency, self._seq, master, response))
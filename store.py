@@ -0,0 +1,206 @@
+"""Compact binary time-series store for readings.
+
+Records are fixed width (see RECORD) and appended to chunk files
+``store_dir/chunk-NNNNNN.fts``; each chunk starts with a small header and
+holds at most ``chunk_records`` records. Floats are stored as float32, the same
+quantization Module applies. Readers memory-map chunks as NumPy structured
+arrays (NumPy is only needed for reading)::
+
+    python store.py convert logs store     # import CSV logs logged since the last convert
+"""
+import csv
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+MAGIC = b"FOXTS"
+VERSION = 1
+# magic, version, record size
+HEADER = struct.Struct("<5sBH")
+HEADER_SIZE = 16
+# timestamp (epoch s), module_id, status, control, concentration, temperature, humidity
+RECORD = struct.Struct("<dIBBfff")
+RECORD_FIELDS = [
+    ("timestamp", "<f8"),
+    ("module_id", "<u4"),
+    ("status", "u1"),
+    ("control", "u1"),
+    ("concentration", "<f4"),
+    ("temperature", "<f4"),
+    ("humidity", "<f4"),
+]
+CHUNK_GLOB = "chunk-*.fts"
+
+
+def record_dtype():
+    import numpy as np
+    return np.dtype(RECORD_FIELDS)
+
+
+def _chunk_path(store_dir, index):
+    return Path(store_dir) / f"chunk-{index:06d}.fts"
+
+
+def chunk_paths(store_dir):
+    return sorted(Path(store_dir).glob(CHUNK_GLOB))
+
+
+class BinaryStore:
+    """Append-only writer. Has the same ``log(module, ts=None)`` as CsvLogger."""
+
+    def __init__(self, store_dir="store", *, chunk_records=1 << 20):
+        self.store_dir = Path(store_dir)
+        self.chunk_records = chunk_records
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._file = None
+        self._count = 0
+        self._lock = threading.Lock()
+        existing = chunk_paths(self.store_dir)
+        self._index = int(existing[-1].stem.split("-")[1]) if existing else 0
+        if existing and existing[-1].stat().st_size >= HEADER_SIZE:
+            count = (existing[-1].stat().st_size - HEADER_SIZE) // RECORD.size
+            if count < chunk_records:
+                # Drop a partial record left by an interrupted write before appending
+                with existing[-1].open("r+b") as f:
+                    f.truncate(HEADER_SIZE + count * RECORD.size)
+                self._open(self._index, count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open(self, index, count=0):
+        self.close()
+        path = _chunk_path(self.store_dir, index)
+        self._file = path.open("ab")
+        if count == 0 and self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size).ljust(HEADER_SIZE, b"\0"))
+        self._index = index
+        self._count = count
+
+    def append(self, ts, module_id, status, control, concentration, temperature, humidity):
+        record = RECORD.pack(ts, module_id, status, control, concentration, temperature, humidity)
+        with self._lock:
+            if self._file is None or self._count >= self.chunk_records:
+                self._open(self._index + 1)
+            self._file.write(record)
+            self._count += 1
+
+    def log(self, module, ts=None):
+        if ts is None:
+            ts = time.time()
+        elif isinstance(ts, datetime):
+            ts = ts.timestamp()
+        self.append(ts, module.module_id, module.status, module.control,
+                    module.concentration, module.temperature, module.humidity)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_chunk(path):
+    """Memory-map one chunk as a read-only structured array (no parsing, no copy).
+
+    A chunk cut short by a crash is read up to its last complete record; one
+    without a complete header is empty.
+    """
+    import numpy as np
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return np.empty(0, dtype=record_dtype())
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path}: not a version {VERSION} store chunk")
+    count = max(0, Path(path).stat().st_size - HEADER_SIZE) // RECORD.size
+    if count == 0:
+        return np.empty(0, dtype=record_dtype())
+    return np.memmap(path, dtype=record_dtype(), mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def read_store(store_dir="store", start=None, end=None):
+    """Return all records with ``start <= timestamp < end`` (epoch seconds) as one array.
+
+    Chunks are appended in time order, so chunks entirely outside the range are
+    skipped after looking at their first/last record only.
+    """
+    import numpy as np
+    parts = []
+    for path in chunk_paths(store_dir):
+        records = read_chunk(path)
+        if not len(records):
+            continue
+        if end is not None and records["timestamp"][0] >= end:
+            continue
+        if start is not None and records["timestamp"][-1] < start:
+            continue
+        mask = np.ones(len(records), dtype=bool)
+        if start is not None:
+            mask &= records["timestamp"] >= start
+        if end is not None:
+            mask &= records["timestamp"] < end
+        parts.append(records if mask.all() else records[mask])
+    if not parts:
+        return np.empty(0, dtype=record_dtype())
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate(parts)
+
+
+def _last_timestamp(store_dir):
+    """Timestamp of the newest record in the store, None if it is empty."""
+    for path in reversed(chunk_paths(store_dir)):
+        records = read_chunk(path)
+        if len(records):
+            return float(records["timestamp"][-1])
+    return None
+
+
+def convert_csv_logs(logs_dir="logs", store_dir="store"):
+    """Append the rows of the daily logs in ``logs_dir`` to the store, in date order; return the row count.
+
+    Plain logs and compressed segments (YYYY-MM-DD-N.csv.gz/.zst) are read, a
+    segment cut short by a crash up to where it breaks. Rows at or before the
+    newest record already in the store are skipped, so converting again later
+    only adds what was logged since. Needs numpy.
+    """
+    from analytics import day_files, iter_log_lines
+    last = _last_timestamp(store_dir)
+    rows = 0
+    with BinaryStore(store_dir) as store:
+        for _, path in day_files(logs_dir):
+            for row in csv.DictReader(line.decode("utf-8") for line in iter_log_lines(path)):
+                ts = datetime.fromisoformat(row["timestamp"]).timestamp()
+                if last is not None and ts <= last:
+                    continue
+                store.append(
+                    ts,
+                    int(row["module_id"]),
+                    int(row["status"], 16),
+                    int(row["control"], 16),
+                    float(row["concentration"]),
+                    float(row["temperature"]),
+                    float(row["humidity"]),
+                )
+                rows += 1
+    return rows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "convert":
+        logs_dir = sys.argv[2] if len(sys.argv) > 2 else "logs"
+        store_dir = sys.argv[3] if len(sys.argv) > 3 else "store"
+        print(f"Converted {convert_csv_logs(logs_dir, store_dir)} rows from {logs_dir} to {store_dir}")
+    else:
+        print("usage: python store.py convert [LOGS_DIR] [STORE_DIR]")
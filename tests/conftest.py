@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import Simulator  # noqa: E402
+
+
+@pytest.fixture
+def simulator():
+    with Simulator() as sim:
+        yield sim
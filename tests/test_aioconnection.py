@@ -0,0 +1,68 @@
+import asyncio
+import struct
+
+import pytest
+
+from aioconnection import AsyncConnection, run_measurement
+from module import Module, CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+from simulator import SimulatedModule
+
+
+def test_concurrent_devices_and_measurement(simulator):
+    ports = [simulator.add(SimulatedModule(module_id=i, sht40_time=0.01, o2_time=0.02)) for i in range(4)]
+
+    async def measure(port):
+        async with AsyncConnection(port) as conn:
+            assert await conn.ping()
+            module = Module()
+            assert await run_measurement(conn, module, CONTROL_MEASUREMENT_SET)
+            return module.module_id
+
+    async def main():
+        return await asyncio.gather(*(measure(p) for p in ports))
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+
+
+def test_requests_stay_serialized_across_close_and_reopen(simulator):
+    device = SimulatedModule(module_id=0x11223344, latency=0.02)
+    port = simulator.add(device)
+
+    async def main():
+        conn = AsyncConnection(port, timeout=0.5)
+        reads = [asyncio.ensure_future(conn.read_registers(0x7C - i, 4 + i)) for i in range(4)]
+        await asyncio.sleep(0.01)  # first read in flight, the others waiting for the bus
+        conn.close()
+        late = [await conn.read_registers(0x7C - i, 4 + i) for i in range(2)]
+        results = await asyncio.gather(*reads)
+        conn.close()
+        return results, late
+
+    results, late = asyncio.run(main())
+    assert results[0] is None  # failed by close()
+    for i, data in list(enumerate(results))[1:] + list(enumerate(late)):
+        assert bytes(data) == bytes(device.registers[0x7C - i:0x80]), i
+
+
+def test_timeout_and_cancellation(simulator):
+    device = SimulatedModule(latency=0.2, sht40_time=0.001)
+    port = simulator.add(device)
+
+    async def main():
+        async with AsyncConnection(port, sleep_timeout=10.0) as conn:
+            assert await conn.read_registers(0x00, 4, timeout=0.5) is not None
+            requests = device.requests
+            # An unanswered write is not resent: it may already have been executed
+            assert not await conn.write_registers(0x04, [CONTROL_SHT40_MEASUREMENT_SET], timeout=0.05)
+            assert device.requests == requests + 1
+            task = asyncio.ensure_future(conn.read_registers(0x7C, 4))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            data = await conn.read_registers(0x7C, 4, timeout=1.0)
+            return struct.unpack("<I", data)[0], conn.stats()
+
+    module_id, stats = asyncio.run(main())
+    assert module_id == 1
+    assert stats["errors"]["timeout"] >= 1
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from analytics import FileIndex, LogAnalytics, iter_file_chunks
+from logger import CsvLogger
+from module import Module
+
+DAY = datetime(2026, 3, 1)
+
+
+def write_logs(logs_dir, compression=None, days=2, step=20):
+    """Two modules, one row each per ``step`` seconds; returns the rows as (ts, module_id, concentration)."""
+    rows = []
+    module = Module()
+    with CsvLogger(logs_dir, compression=compression, flush_rows=5000) as logger:
+        for i in range(days * 86400 // step):
+            ts = DAY + timedelta(seconds=i * step)
+            for module_id in (1, 2):
+                module.module_id = module_id
+                module.concentration = 20.0 + module_id + (i % 100) / 100
+                logger.log(module, ts)
+                rows.append((ts, module_id, module.concentration))
+    return rows
+
+
+@pytest.fixture(params=[None, "gzip"])
+def logs(request, tmp_path):
+    rows = write_logs(tmp_path / "logs", request.param)
+    return tmp_path / "logs", rows
+
+
+def expected(rows, start, end, module_id):
+    return np.array([c for ts, m, c in rows if start <= ts < end and m == module_id], np.float32).astype(np.float64)
+
+
+def test_summary_matches_rows_and_cache(logs, tmp_path):
+    logs_dir, rows = logs
+    start, end = DAY + timedelta(hours=5, seconds=10), DAY + timedelta(days=1, hours=3)
+    analytics = LogAnalytics(logs_dir, tmp_path / "cache")
+    for _ in range(2):  # second round from the cache
+        summary = analytics.summary(start, end, fields=["concentration"])
+        values = expected(rows, start, end, 2)
+        stats = summary[2]["concentration"]
+        assert stats["count"] == len(values)
+        assert stats["min"] == values.min() and stats["max"] == values.max()
+        assert stats["mean"] == pytest.approx(values.mean())
+        assert stats["p50"] == pytest.approx(np.percentile(values, 50, method="inverted_cdf"), abs=0.001)
+    whole = LogAnalytics(logs_dir, tmp_path / "cache").summary()
+    assert whole[1]["concentration"]["count"] == len(rows) // 2
+    assert list((tmp_path / "cache").glob("*.json"))
+
+
+def test_downsample(logs, tmp_path):
+    logs_dir, rows = logs
+    start, end = DAY + timedelta(hours=23), DAY + timedelta(days=1, hours=1)
+    result = LogAnalytics(logs_dir, tmp_path / "cache").downsample(start, end, interval=3600)
+    buckets = result[1]
+    assert list(buckets["timestamp"]) == [np.datetime64(DAY + timedelta(hours=h)) for h in (23, 24)]
+    first_hour = expected(rows, start, start + timedelta(hours=1), 1)
+    assert buckets["count"][0] == len(first_hour)
+    assert buckets["mean"][0] == pytest.approx(first_hour.mean())
+    assert buckets["min"][0] == first_hour.min() and buckets["max"][0] == first_hour.max()
+
+
+def test_range_with_and_without_index_agree(tmp_path):
+    rows = write_logs(tmp_path, days=1, step=2)
+    path = tmp_path / "2026-03-01.csv"
+    index = FileIndex(path).update()
+    assert index.lines == len(rows) + 1
+    for start, end in [(DAY + timedelta(hours=12), DAY + timedelta(hours=12, minutes=5)),
+                       (DAY - timedelta(hours=1), DAY + timedelta(seconds=10)),
+                       (DAY + timedelta(hours=23, minutes=59), DAY + timedelta(days=1))]:
+        plain = np.concatenate(list(iter_file_chunks(path, start, end, chunk_bytes=4096)))
+        indexed = np.concatenate(list(iter_file_chunks(path, start, end, index, chunk_bytes=4096)))
+        assert np.array_equal(plain, indexed)
+        assert len(plain) == sum(1 for ts, _, _ in rows if start <= ts < end)
+
+
+def test_index_follows_appends(tmp_path):
+    write_logs(tmp_path, days=1, step=3600)
+    path = tmp_path / "2026-03-01.csv"
+    index = FileIndex(path).update()
+    lines = index.lines
+    with path.open("a") as f:
+        f.write("2026-03-01T23:59:59,1,0.0,0.0,0x00,0x00,21.000000,0.000000,0.000000\n")
+    assert index.update().lines == lines + 1
+
+
+def test_truncated_segment_is_read_up_to_the_break(tmp_path):
+    rows = write_logs(tmp_path, "gzip", days=1, step=2)
+    path = tmp_path / "2026-03-01-1.csv.gz"
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])  # writer killed mid-stream
+    later = DAY + timedelta(hours=23, minutes=59, seconds=59)
+    with CsvLogger(tmp_path, compression="gzip") as logger:  # next run gets its own segment
+        logger.log(Module(), later)
+    chunks = np.concatenate(list(iter_file_chunks(path)))
+    assert 0 < len(chunks) < len(rows)
+    assert np.array_equal(chunks["timestamp"], np.array([ts for ts, _, _ in rows[:len(chunks)]], "datetime64[s]"))
+    summary = LogAnalytics(tmp_path, tmp_path / "cache").summary(DAY, DAY + timedelta(days=1))
+    assert summary[0]["concentration"]["count"] == 1
+    assert summary[1]["concentration"]["count"] + summary[2]["concentration"]["count"] == len(chunks)
+
+
+def test_downsample_keeps_32_bit_module_ids(tmp_path):
+    ids = (0x12345678, 0xFFFFFFF0, 7)
+    module = Module()
+    with CsvLogger(tmp_path) as logger:
+        for i in range(120):
+            for module_id in ids:
+                module.module_id = module_id
+                module.concentration = 20.0 + i % 3
+                logger.log(module, DAY + timedelta(seconds=i * 60))
+    result = LogAnalytics(tmp_path, tmp_path / "cache").downsample(DAY, DAY + timedelta(hours=2), interval=3600)
+    assert sorted(result) == sorted(ids)
+    assert all(buckets["count"].tolist() == [60, 60] for buckets in result.values())
+
+
+def test_index_seeks_before_rows_of_the_same_second(tmp_path, monkeypatch):
+    monkeypatch.setattr("analytics.INDEX_STRIDE", 4)  # splits the 3 rows of a second
+    module = Module()
+    with CsvLogger(tmp_path) as logger:
+        for i in range(50):
+            for module_id in (1, 2, 3):
+                module.module_id = module_id
+                logger.log(module, DAY + timedelta(seconds=i))
+    path = tmp_path / "2026-03-01.csv"
+    index = FileIndex(path).update()
+    for second in range(50):
+        start = DAY + timedelta(seconds=second)
+        rows = np.concatenate(list(iter_file_chunks(path, start, start + timedelta(seconds=1), index)))
+        assert rows["module_id"].tolist() == [1, 2, 3]
@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch import decode_pages, view_pages
+from module import Module
+from registers import REGISTERS_PAGE_SIZE, REGISTER_SCHEMA
+
+
+def pages(n):
+    rng = random.Random(2)
+    return [bytes(rng.getrandbits(8) for _ in range(REGISTERS_PAGE_SIZE)) for _ in range(n)]
+
+
+def test_matches_module_deserialize():
+    raw = pages(50)
+    columns = decode_pages(b"".join(raw))
+    assert columns["concentration"].dtype == np.float32
+    for i, page in enumerate(raw):
+        module = Module()
+        module.deserialize(page)
+        for name, _, _ in REGISTER_SCHEMA:
+            value = columns[name][i].item()
+            expected = getattr(module, name)
+            assert value == expected or (value != value and expected != expected), name
+
+
+def test_array_input_views_without_copy():
+    array = np.frombuffer(b"".join(pages(3)), dtype=np.uint8).reshape(3, REGISTERS_PAGE_SIZE).copy()
+    columns = decode_pages(array, copy=False)
+    array[1, 0x7C:0x80] = [1, 0, 0, 0]
+    assert columns["module_id"][1] == 1
+
+
+def test_rejects_bad_shapes():
+    with pytest.raises(ValueError):
+        view_pages(bytes(REGISTERS_PAGE_SIZE + 1))
+    with pytest.raises(ValueError):
+        view_pages(np.zeros((2, 128), np.uint8))
@@ -0,0 +1,28 @@
+import json
+
+import bench
+
+
+def test_measure_and_summary():
+    result = bench.measure(lambda: None, duration=0.01)
+    assert result["ops"] > 0 and result["ops_per_sec"] > 0
+    assert result["p50_us"] <= result["p99_us"] <= result["max_us"]
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"results": {"a": {"ops_per_sec": 100.0}, "b": {"ops_per_sec": 100.0}, "gone": {"ops_per_sec": 1.0}}}
+    report = {"results": {"a": {"ops_per_sec": 91.0}, "b": {"ops_per_sec": 89.0}, "new": {"ops_per_sec": 5.0}}}
+    diff = bench.compare(report, baseline, threshold=0.10)
+    assert set(diff) == {"a", "b"}
+    assert not diff["a"][3] and diff["b"][3]
+
+
+def test_main_json_and_compare(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    assert bench.main(["--filter", "crc16_16B", "--duration", "0.01", "--json", str(path)]) == 0
+    stored = json.loads(path.read_text())
+    assert list(stored["results"]) == ["crc16_16B"]
+    stored["results"]["crc16_16B"]["ops_per_sec"] *= 1000
+    path.write_text(json.dumps(stored))
+    assert bench.main(["--filter", "crc16_16B", "--duration", "0.01", "--compare", str(path)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
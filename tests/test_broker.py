@@ -0,0 +1,48 @@
+import threading
+import time
+
+import pytest
+
+from broker import Broker, BrokerClient
+from simulator import SimulatedModule
+
+
+@pytest.fixture
+def served(simulator, tmp_path):
+    port = simulator.add(SimulatedModule(module_id=4, sht40_time=0.001, o2_time=0.01))
+    broker = Broker([port], str(tmp_path / "broker.sock"), ttl=60.0)
+    thread = threading.Thread(target=broker.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while broker._server is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    with BrokerClient(broker.socket_path) as client:
+        yield port, client
+    broker.shutdown()
+    thread.join(5)
+
+
+def test_get_is_cached_until_max_age(served):
+    port, client = served
+    first = client.get(port, "sht40")
+    assert first["ok"] and not first["cached"] and first["reading"]["module_id"] == 4
+    assert client.get(port, "sht40")["cached"]
+    assert not client.get(port, "sht40", max_age=0)["cached"]
+    assert not client.measure(port, "sht40")["cached"]
+
+
+@pytest.mark.parametrize("request_fields", [
+    {"cmd": "get", "kind": "sht40", "max_age": "5"},
+    {"cmd": "get", "kind": "sht40", "max_age": [5]},
+    {"cmd": "get", "kind": ["sht40"]},
+    {"cmd": "get", "port": {"a": 1}},
+    {"cmd": "nope"},
+])
+def test_malformed_requests_get_an_error_response(served, request_fields):
+    port, client = served
+    request_fields.setdefault("port", port)
+    response = client.request(**request_fields)
+    assert response["ok"] is False and response["error"]
+    # The connection stays usable
+    assert client.request(cmd="list") == {"ok": True, "ports": [port]}
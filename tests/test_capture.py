@@ -0,0 +1,60 @@
+from capture import READ, WRITE, CaptureWriter, ReplaySerial, exchanges, load_capture, replay_decode
+from connection import Connection
+from measurement import read_fields
+from module import Module
+from simulator import SimulatedModule
+
+
+def record_session(simulator, path):
+    port = simulator.add(SimulatedModule(module_id=11))
+    module = Module()
+    with CaptureWriter(path) as cap, Connection(port, capture=cap) as conn:
+        assert conn.ping()
+        assert read_fields(conn, module)
+    return load_capture(path), module
+
+
+def test_capture_records_every_exchange(simulator, tmp_path):
+    records, module = record_session(simulator, tmp_path / "bus.cap")
+    assert module.module_id == 11
+    assert records[0][1] == WRITE and records[-1][1] == READ
+    assert [t for t, _, _ in records] == sorted(t for t, _, _ in records)
+    assert len(exchanges(records)) == 3  # wake ping + two planned reads
+
+
+def test_capture_is_readable_before_close(simulator, tmp_path):
+    port = simulator.add(SimulatedModule())
+    path = tmp_path / "bus.cap"
+    with CaptureWriter(path) as cap, Connection(port, capture=cap) as conn:
+        assert conn.ping()
+        records = load_capture(path)  # as after a crash: nothing closed or flushed on exit
+        directions = [direction for _, direction, _ in records]
+        assert directions[0] == WRITE and directions[1:] and set(directions[1:]) == {READ}
+
+
+def test_replay_through_connection_reproduces_reading(simulator, tmp_path):
+    records, recorded = record_session(simulator, tmp_path / "bus.cap")
+    replay = ReplaySerial(records)
+    module = Module()
+    with Connection("replay", transport=replay) as conn:
+        assert conn.ping()
+        assert read_fields(conn, module)
+    assert module.to_dict() == recorded.to_dict()
+    assert replay.mismatches == 0 and replay.exhausted
+
+
+def test_replay_decode_counts_frames(simulator, tmp_path):
+    records, recorded = record_session(simulator, tmp_path / "bus.cap")
+    module = Module()
+    assert replay_decode(records, module) == (3, 2, 0)
+    assert module.to_dict() == recorded.to_dict()
+
+
+def test_truncated_capture_keeps_complete_records(simulator, tmp_path):
+    path = tmp_path / "bus.cap"
+    records, _ = record_session(simulator, path)
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+    truncated = load_capture(path)
+    assert len(truncated) == len(records)
+    assert truncated[-1][2] == records[-1][2][:-5]
@@ -0,0 +1,22 @@
+from client import READ_MERGE_GAP, plan_register_reads
+
+
+def test_default_plan_skips_unmapped_registers():
+    assert plan_register_reads() == [(0x00, 0x14), (0x7C, 4)]
+
+
+def test_gap_boundary():
+    # control (0x04) and status (0x06) are one unused byte apart
+    assert plan_register_reads(["control", "status"], merge_gap=0) == [(0x04, 1), (0x06, 1)]
+    assert plan_register_reads(["control", "status"], merge_gap=1) == [(0x04, 3)]
+    # humidity ends at 0x14, module_id starts at 0x7C
+    gap = 0x7C - 0x14
+    assert plan_register_reads(["humidity", "module_id"], merge_gap=gap) == [(0x10, 0x70)]
+    assert plan_register_reads(["humidity", "module_id"], merge_gap=gap - 1) == [(0x10, 4), (0x7C, 4)]
+    assert gap > READ_MERGE_GAP
+
+
+def test_overlapping_fields_and_groups():
+    assert plan_register_reads(["register_map_ver_minor", "register_map_version", "firmware_version"]) == [(0x00, 4)]
+    assert plan_register_reads(["temperature", "concentration"], merge_gap=0) == [(0x08, 8)]
+    assert plan_register_reads([]) == []
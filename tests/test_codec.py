@@ -0,0 +1,82 @@
+import random
+import struct
+
+from codec import RegisterCodec
+from module import Module
+from registers import REGISTERS_PAGE_SIZE, REGISTER_SCHEMA, Registers as R
+
+
+def baseline_deserialize(data):
+    """Field values as decoded by the original hand-written Module.deserialize."""
+    f32 = struct.Struct("<f")
+    return {
+        "register_map_ver_minor": data[R.REG_MAP_VER_LSB],
+        "register_map_ver_major": data[R.REG_MAP_VER_MSB],
+        "control": data[R.REG_CONTROL],
+        "status": data[R.REG_STATUS],
+        "firmware_ver_minor": data[R.REG_FIRMWARE_VER_LSB],
+        "firmware_ver_major": data[R.REG_FIRMWARE_VER_MSB],
+        "concentration": f32.unpack(bytes(data[R.REG_CONCENTRATION_LLSB:R.REG_CONCENTRATION_MMSB + 1]))[0],
+        "temperature": f32.unpack(bytes(data[R.REG_TEMPERATURE_LLSB:R.REG_TEMPERATURE_MMSB + 1]))[0],
+        "humidity": f32.unpack(bytes(data[R.REG_HUMIDITY_LLSB:R.REG_HUMIDITY_MMSB + 1]))[0],
+        "module_id": (data[R.REG_DEVICE_ID_LLSB] | data[R.REG_DEVICE_ID_LMSB] << 8
+                      | data[R.REG_DEVICE_ID_MLSB] << 16 | data[R.REG_DEVICE_ID_MMSB] << 24),
+    }
+
+
+def same(a, b):
+    return a == b or (a != a and b != b)  # NaN pages decode to NaN
+
+
+def random_pages(n=200):
+    rng = random.Random(1)
+    yield bytes(REGISTERS_PAGE_SIZE)
+    yield b"\xff" * REGISTERS_PAGE_SIZE
+    for _ in range(n):
+        yield bytes(rng.getrandbits(8) for _ in range(REGISTERS_PAGE_SIZE))
+
+
+def test_full_page_matches_baseline_decode():
+    for page in random_pages():
+        module = Module()
+        assert module.deserialize(page)
+        for name, value in baseline_deserialize(page).items():
+            assert same(getattr(module, name), value), name
+        assert same(RegisterCodec().decode(0, page)["humidity"], module.humidity)
+
+
+def test_range_decode_matches_full_page():
+    for page in random_pages(20):
+        full = Module()
+        full.deserialize(page)
+        for address, length in ((0x00, 0x14), (0x04, 3), (0x08, 4), (0x0A, 8), (0x7C, 4)):
+            partial = Module()
+            names = partial.deserialize_range(address, page[address:address + length])
+            expected = [name for name, register, fmt in REGISTER_SCHEMA
+                        if register >= address and register + struct.calcsize(fmt) <= address + length]
+            assert list(names) == expected
+            for name in names:
+                assert same(getattr(partial, name), getattr(full, name)), name
+
+
+def test_short_page_and_memoryview_input():
+    module = Module()
+    assert not module.deserialize(bytes(REGISTERS_PAGE_SIZE - 1))
+    page = bytearray(REGISTERS_PAGE_SIZE)
+    struct.pack_into("<I", page, R.REG_DEVICE_ID_LLSB, 0xDEADBEEF)
+    assert module.deserialize(memoryview(page))
+    assert module.module_id == 0xDEADBEEF
+
+
+def test_storage_mapping_and_empty_range():
+    class Target:
+        pass
+
+    codec = RegisterCodec(storage={"humidity": "_h"})
+    target = Target()
+    page = bytearray(REGISTERS_PAGE_SIZE)
+    struct.pack_into("<f", page, R.REG_HUMIDITY_LLSB, 0.5)
+    assert codec.decode_into(target, R.REG_HUMIDITY_LLSB, page[R.REG_HUMIDITY_LLSB:R.REG_HUMIDITY_LLSB + 4]) == ("humidity",)
+    assert target._h == 0.5
+    assert codec.decode_into(target, 0x20, bytes(8)) == ()
+    assert codec.decode(0x20, bytes(8)) == {}
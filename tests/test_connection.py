@@ -0,0 +1,118 @@
+import time
+
+import serial
+
+import connection
+from connection import Connection
+from metrics import Metrics
+from module import CONTROL_SHT40_MEASUREMENT_SET
+from simulator import SimulatedModule
+
+
+def test_port_stays_open_across_exchanges(simulator):
+    port = simulator.add(SimulatedModule(module_id=7))
+    with Connection(port) as conn:
+        assert conn.ping()
+        ser = conn._ser
+        for _ in range(3):
+            data = conn.read_registers(0x7C, 4)
+            assert bytes(data) == (7).to_bytes(4, "little")
+        assert conn._ser is ser
+        assert conn.reconnects == 0
+    assert not conn.is_open
+
+
+class UnpluggedPort:
+    is_open = True
+
+    def reset_input_buffer(self):
+        raise serial.SerialException("device reports readiness to read but returned no data")
+
+    def close(self):
+        pass
+
+
+def test_reopens_after_serial_error(simulator):
+    port = simulator.add(SimulatedModule())
+    with Connection(port, metrics=Metrics()) as conn:
+        assert conn.ping(force=True)
+        conn._ser.close()
+        conn._ser = UnpluggedPort()
+        assert conn.read_registers(0x00, 4) is not None
+        assert conn.reconnects == 1
+        assert conn.errors["serial"] == 1
+
+
+class FailingRead:
+    """Real port whose first read after a write raises, as on an unplug mid-exchange."""
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+    def read(self, size):
+        if not self.failed:
+            self.failed = True
+            raise serial.SerialException("device disconnected")
+        return self.ser.read(size)
+
+
+def test_serial_error_after_write_is_not_resent(simulator):
+    module = SimulatedModule()
+    port = simulator.add(module)
+    with Connection(port, metrics=Metrics()) as conn:
+        assert conn.ping(force=True)
+        requests = module.requests
+        conn._ser = FailingRead(conn._ser)
+        assert not conn.write_registers(0x04, [CONTROL_SHT40_MEASUREMENT_SET])
+        assert conn.reconnects == 0
+        time.sleep(0.05)
+        assert module.requests - requests == 1
+        # A read is resent on the reopened port
+        conn._ser = FailingRead(conn.open())
+        assert conn.read_registers(0x00, 4) is not None
+        assert conn.reconnects == 1
+
+
+def test_ping_fails_without_device():
+    conn = Connection("/nonexistent/port", reconnect_attempts=0)
+    assert conn.ping() is False
+
+
+def test_awake_module_skips_wake_pings(simulator):
+    port = simulator.add(SimulatedModule())
+    with Connection(port, sleep_timeout=10.0) as conn:
+        for _ in range(3):
+            assert conn.ping()
+            assert conn.read_registers(0x00, 4) is not None
+        stats = conn.stats()
+    assert stats["wake_pings"] == 1 and stats["pings_skipped"] == 2
+    assert stats["transactions"] == 4
+
+
+def test_write_answered_ready_is_resent(simulator):
+    module = SimulatedModule(sleep_timeout=0.05)
+    port = simulator.add(module)
+    with Connection(port, sleep_timeout=10.0) as conn:
+        assert conn.ping(force=True)
+        time.sleep(0.1)  # the module falls asleep while the connection still counts it as awake
+        requests = module.requests
+        assert conn.write_registers(0x04, [CONTROL_SHT40_MEASUREMENT_SET])
+        assert module.requests - requests == 2
+        assert conn.rewakes == 1
+
+
+def test_unanswered_write_is_not_resent(simulator, monkeypatch):
+    monkeypatch.setattr(connection, "RESPONSE_TIMEOUT_NS", 50_000_000)
+    module = SimulatedModule(drop_rate=1.0)
+    port = simulator.add(module)
+    with Connection(port, metrics=Metrics()) as conn:
+        assert not conn.write_registers(0x04, [CONTROL_SHT40_MEASUREMENT_SET])
+        assert module.requests == 1
+        # A read has no side effect: a wake ping follows (resending it if the module answers)
+        assert conn.read_registers(0x00, 4) is None
+        assert module.requests == 3
+        assert conn.rewakes == 1 and conn.errors["timeout"] == 3
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from deadband import DeadbandLogger
+from module import Module
+
+T0 = datetime(2026, 1, 1)
+
+
+class ListLogger:
+    def __init__(self):
+        self.rows = []
+
+    def log(self, module, ts):
+        self.rows.append((ts, module.concentration, module.temperature, module.status))
+
+    def close(self):
+        pass
+
+
+def reading(concentration=20.9, temperature=22.5, status=0):
+    module = Module()
+    module.module_id = 1
+    module.concentration = concentration
+    module.temperature = temperature
+    module.humidity = 40.0
+    module.status = status
+    return module
+
+
+def test_drops_changes_within_tolerance_of_last_written_row():
+    logger = DeadbandLogger(ListLogger(), heartbeat=60.0)
+    for i, concentration in enumerate([20.900, 20.905, 20.909, 20.912, 20.913]):
+        logger.log(reading(concentration), T0 + timedelta(seconds=i))
+    # 20.912 is more than 0.01 from the written 20.900, though each step is smaller
+    assert [row[1] for row in logger.logger.rows] == [pytest.approx(20.9), pytest.approx(20.912)]
+    assert logger.samples == 5 and logger.written == 2 and logger.reduction == 2.5
+
+
+def test_status_change_and_heartbeat_are_written():
+    logger = DeadbandLogger(ListLogger(), heartbeat=10.0)
+    logger.log(reading(), T0)
+    logger.log(reading(status=0x04), T0 + timedelta(seconds=1))
+    logger.log(reading(status=0x04), T0 + timedelta(seconds=5))
+    logger.log(reading(status=0x04), T0 + timedelta(seconds=11))
+    assert [row[0] for row in logger.logger.rows] == [T0, T0 + timedelta(seconds=1), T0 + timedelta(seconds=11)]
+
+
+def test_fields_without_tolerance_compare_exactly():
+    logger = DeadbandLogger(ListLogger(), {"concentration": 0.5})
+    logger.log(reading(), T0)
+    logger.log(reading(concentration=21.0), T0 + timedelta(seconds=1))
+    logger.log(reading(concentration=21.0, temperature=22.501), T0 + timedelta(seconds=2))
+    logger.log(reading(concentration=float("nan"), temperature=22.501), T0 + timedelta(seconds=3))
+    assert len(logger.logger.rows) == 3
+
+
+def test_unknown_tolerance_field_is_rejected():
+    with pytest.raises(ValueError):
+        DeadbandLogger(ListLogger(), {"pressure": 1.0})
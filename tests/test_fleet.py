@@ -0,0 +1,36 @@
+import time
+
+from fleet import DeviceSchedule, FleetPoller
+from simulator import SimulatedModule
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_polls_every_port(simulator):
+    ports = [simulator.add(SimulatedModule(module_id=i, sht40_time=0.001)) for i in range(4)]
+    with FleetPoller(DeviceSchedule(p, sht40_interval=0.01) for p in ports) as fleet:
+        wait_until(lambda: all(s.readings >= 3 for s in fleet.results().values()))
+    results = fleet.results()
+    assert [results[p].module.module_id for p in ports] == [0, 1, 2, 3]
+
+
+def test_failing_callback_does_not_stop_polling(simulator):
+    port = simulator.add(SimulatedModule(sht40_time=0.001))
+    calls = []
+
+    def on_reading(port, module):
+        calls.append(module)
+        if len(calls) == 1:
+            raise RuntimeError("consumer bug")
+
+    with FleetPoller([DeviceSchedule(port, sht40_interval=0.01)], on_reading=on_reading) as fleet:
+        wait_until(lambda: len(calls) >= 3)
+    state = fleet.results()[port]
+    assert state.callback_errors == 1
+    assert state.errors == 0
+    assert "consumer bug" in state.last_error
@@ -0,0 +1,52 @@
+import csv
+import gzip
+from datetime import datetime
+
+from logger import LOG_HEADER, CsvLogger
+from module import Module
+
+
+def make_module(module_id=1, concentration=20.9):
+    module = Module()
+    module.module_id = module_id
+    module.concentration = concentration
+    module.temperature = 22.5
+    module.humidity = 40.0
+    return module
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_rows_are_written_on_close_and_split_by_day(tmp_path):
+    with CsvLogger(tmp_path, flush_rows=1000, flush_interval=60.0) as logger:
+        logger.log(make_module(1), datetime(2026, 1, 1, 23, 59, 59))
+        logger.log(make_module(2, 21.0), datetime(2026, 1, 2, 0, 0, 0))
+    assert logger.rows_written == 2 and logger.dropped == 0
+    first = read_rows(tmp_path / "2026-01-01.csv")
+    assert first[0] == LOG_HEADER
+    assert first[1] == ["2026-01-01T23:59:59", "1", "0.0", "0.0", "0x00", "0x00", "20.900000", "22.500000", "40.000000"]
+    assert [row[1] for row in read_rows(tmp_path / "2026-01-02.csv")[1:]] == ["2"]
+
+
+def test_reopening_appends_without_second_header(tmp_path):
+    ts = datetime(2026, 1, 1, 12, 0, 0)
+    for module_id in (1, 2):
+        with CsvLogger(tmp_path) as logger:
+            logger.log(make_module(module_id), ts)
+    rows = read_rows(tmp_path / "2026-01-01.csv")
+    assert rows[0] == LOG_HEADER
+    assert [row[1] for row in rows[1:]] == ["1", "2"]
+
+
+def test_compressed_runs_write_their_own_segments(tmp_path):
+    ts = datetime(2026, 1, 1, 12, 0, 0)
+    for module_id in (1, 2):
+        with CsvLogger(tmp_path, compression="gzip") as logger:
+            logger.log(make_module(module_id), ts)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["2026-01-01-1.csv.gz", "2026-01-01-2.csv.gz"]
+    with gzip.open(tmp_path / "2026-01-01-2.csv.gz", "rt", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == LOG_HEADER and rows[1][1] == "2"
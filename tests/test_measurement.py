@@ -0,0 +1,27 @@
+from connection import Connection
+from measurement import MeasurementWaiter, run_measurement
+from module import Module, CONTROL_MEASUREMENT_SET, CONTROL_SHT40_MEASUREMENT_SET
+from simulator import SimulatedModule
+
+
+def test_polled_measurement_completes_and_learns_duration(simulator):
+    port = simulator.add(SimulatedModule(module_id=3, sht40_time=0.02, o2_time=0.03))
+    module = Module()
+    with Connection(port) as conn:
+        waiter = MeasurementWaiter(conn)
+        for _ in range(3):
+            assert run_measurement(conn, module, CONTROL_MEASUREMENT_SET, waiter)
+    assert module.module_id == 3
+    assert not module.control & CONTROL_MEASUREMENT_SET
+    timing = waiter.timing()["o2"]
+    assert timing["samples"] == 3 and timing["timeouts"] == 0
+    assert 0.05 <= timing["expected_s"] < 0.5
+
+
+def test_deadline(simulator):
+    port = simulator.add(SimulatedModule(sht40_time=5.0))
+    module = Module()
+    with Connection(port) as conn:
+        waiter = MeasurementWaiter(conn, deadline=0.1)
+        assert not run_measurement(conn, module, CONTROL_SHT40_MEASUREMENT_SET, waiter)
+    assert waiter.timing()["sht40"]["timeouts"] == 1
@@ -0,0 +1,56 @@
+import random
+import re
+import urllib.request
+
+from metrics import Histogram, Metrics
+
+# One sample line of the text exposition format, label values escaped
+SAMPLE = re.compile(r'^[a-z_]+\{(?:[a-z_]+="(?:[^"\\\n]|\\[\\"n])*",?)*\} [0-9.e+-]+$')
+
+
+def test_percentiles_within_bucket_error():
+    rng = random.Random(3)
+    values = sorted(int(rng.lognormvariate(13, 1.0)) for _ in range(20000))
+    h = Histogram()
+    for v in values:
+        h.record(v)
+    assert h.count == len(values) and h.max_ns == values[-1]
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert exact <= h.percentile(q) <= exact * 1.07
+    assert h.percentile(1.0) == values[-1]
+
+
+def test_small_and_negative_values():
+    h = Histogram()
+    for v in (-5, 0, 1, 2, 31):
+        h.record(v)
+    assert h.percentile(0.2) <= 1 and h.percentile(1.0) == 31
+    assert Histogram().percentile(0.5) == 0
+
+
+def test_render_escapes_label_values():
+    metrics = Metrics()
+    port = 'C:\\ports\\"usb"\n0'
+    metrics.phase(port, "ping").record(1000)
+    metrics.errors(port)["timeout"] += 2
+    text = metrics.render()
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            assert SAMPLE.match(line), line
+    assert 'port="C:\\\\ports\\\\\\"usb\\"\\n0"' in text
+    assert 'faradayox_errors_total{port="C:\\\\ports\\\\\\"usb\\"\\n0",kind="timeout"} 2' in text
+
+
+def test_serve_and_textfile(tmp_path):
+    metrics = Metrics(prefix="test")
+    metrics.phase("/dev/ttyUSB0", "write").record(2_000_000)
+    server = metrics.serve(("127.0.0.1", 0))
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+    assert 'test_phase_seconds_count{port="/dev/ttyUSB0",phase="write"} 1' in body
+    metrics.write_textfile(tmp_path / "fox.prom")
+    assert (tmp_path / "fox.prom").read_text() == metrics.render()
@@ -0,0 +1,93 @@
+from protocol import (
+    ACK,
+    NACK,
+    OPERATION_READ,
+    OPERATION_WRITE,
+    READY,
+    STX,
+    FrameDecoder,
+    _crc16_ccitt_false,
+    _crc16_ccitt_false_table,
+    build_frame,
+    process_frame,
+)
+
+
+def response(op, payload=b"", address=None):
+    frame = bytearray([STX, op])
+    if address is not None:
+        frame += bytes([address & 0xFF, address >> 8, len(payload) & 0xFF, len(payload) >> 8])
+    frame += payload
+    crc = _crc16_ccitt_false(frame[1:])
+    return bytes(frame + bytes([crc & 0xFF, crc >> 8, 0x0A]))
+
+
+def test_read_ack_split_into_single_bytes():
+    frame = response(ACK, bytes(range(16)), address=0x08)
+    decoder = FrameDecoder(OPERATION_READ)
+    frames = []
+    for i in range(len(frame)):
+        frames += decoder.feed(frame[i:i + 1])
+        if i < len(frame) - 1:
+            assert frames == []
+            assert decoder.missing >= 1
+    assert frames == [frame]
+    assert bytes(process_frame(frames[0])) == bytes(range(16))
+    assert decoder.pending == b""
+
+
+def test_resyncs_after_garbage_and_bad_etx():
+    good = response(ACK, b"\x01\x02", address=0)
+    broken = bytearray(good)
+    broken[-1] = 0x00  # lost ETX
+    decoder = FrameDecoder(OPERATION_READ)
+    frames = decoder.feed(b"\xff\x00" + bytes(broken) + b"\x13" + good)
+    assert frames == [good]
+    assert decoder.bad_etx == 1
+
+
+def test_several_frames_in_one_chunk_and_partial_tail():
+    ready = response(READY)
+    ack = response(ACK)
+    decoder = FrameDecoder(OPERATION_WRITE)
+    frames = decoder.feed(ready + ack + ack[:3])
+    assert frames == [ready, ack]
+    assert decoder.pending == ack[:3]
+    assert decoder.feed(ack[3:]) == [ack]
+
+
+def test_nack_and_unknown_op():
+    nack = response(NACK, b"\x01")
+    decoder = FrameDecoder(OPERATION_READ)
+    # STX followed by an op that is no response is skipped
+    assert decoder.feed(bytes([STX, 0x99]) + nack) == [nack]
+
+
+def test_oversized_length_is_not_a_frame():
+    decoder = FrameDecoder(OPERATION_READ)
+    assert decoder.feed(bytes([STX, ACK, 0, 0, 0xFF, 0xFF])) == []
+    assert decoder.pending == b""
+
+
+def test_process_frame_rejects_bad_crc():
+    frame = bytearray(response(ACK, b"\x05", address=0))
+    frame[-3] ^= 0xFF
+    assert process_frame(bytes(frame)) is None
+
+
+def test_crc_check_value_and_input_types():
+    assert _crc16_ccitt_false(b"123456789") == 0x29B1
+    assert _crc16_ccitt_false_table(b"123456789") == 0x29B1
+    data = bytes(range(256)) * 2
+    expected = _crc16_ccitt_false_table(data)
+    for value in (data, bytearray(data), memoryview(data), list(data)):
+        assert _crc16_ccitt_false(value) == expected
+
+
+def test_frames_are_not_copied():
+    frame = build_frame(OPERATION_WRITE, 0x0004, b"\x02", 1)
+    assert isinstance(frame, bytearray)
+    assert frame[-1] == 0x0A and _crc16_ccitt_false(frame[1:-3]) == frame[-3] | (frame[-2] << 8)
+    page = response(ACK, bytes(range(8)), address=0)
+    payload = process_frame(page)
+    assert isinstance(payload, memoryview) and payload.obj is page
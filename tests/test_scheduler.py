@@ -0,0 +1,38 @@
+from connection import Connection
+from module import CONTROL_SHT40_MEASUREMENT_SET
+from scheduler import AcquisitionScheduler
+from simulator import SimulatedModule
+
+
+def test_achieved_rate_does_not_exceed_target(simulator):
+    port = simulator.add(SimulatedModule(module_id=9, sht40_time=0.001))
+    readings = []
+    with Connection(port) as conn:
+        scheduler = AcquisitionScheduler(conn, sht40_interval=0.1, o2_interval=None,
+                                         on_reading=lambda m: readings.append(m.module_id))
+        scheduler.run(duration=1.0)
+    stats = scheduler.stats()["sht40"]
+    assert stats["completed"] == 10 and stats["failed"] == 0
+    assert abs(stats["achieved_hz"] - stats["target_hz"]) < 1e-6
+    assert readings == [9] * 10
+
+
+def test_skipped_periods_lower_the_achieved_rate(simulator, monkeypatch):
+    port = simulator.add(SimulatedModule(sht40_time=0.001))
+    with Connection(port) as conn:
+        scheduler = AcquisitionScheduler(conn, sht40_interval=0.05, o2_interval=None)
+        measure = scheduler._measure
+        calls = []
+
+        def slow_measure(control_bit):
+            calls.append(control_bit)
+            if len(calls) == 3:
+                scheduler._stop.wait(0.12)  # stall past two deadlines
+            return measure(control_bit)
+
+        monkeypatch.setattr(scheduler, "_measure", slow_measure)
+        scheduler.run(duration=0.5)
+    stats = scheduler.stats()["sht40"]
+    assert calls == [CONTROL_SHT40_MEASUREMENT_SET] * len(calls)
+    assert stats["skipped"] >= 2
+    assert stats["achieved_hz"] < stats["target_hz"]
@@ -0,0 +1,60 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from fleet import DeviceSchedule
+from module import Module
+from sharding import SLOT_DTYPE, ShardedFleet, module_from_row, publish, read_consistent, release_rows
+from simulator import SimulatedModule
+
+
+def wait_until(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def reading(module_id=7, concentration=20.93):
+    module = Module()
+    module.module_id = module_id
+    module.concentration = concentration
+    return module
+
+
+def test_publish_round_trips_a_reading():
+    slots = np.zeros(2, SLOT_DTYPE)
+    publish(slots, 1, reading(), ts=123.0)
+    row = read_consistent(slots)[1]
+    assert row["seq"] == 2 and row["readings"] == 1 and row["timestamp"] == 123.0
+    module = module_from_row(row)
+    assert module.module_id == 7 and module.concentration == reading().concentration
+
+
+def test_row_left_odd_by_a_dead_writer():
+    slots = np.zeros(2, SLOT_DTYPE)
+    slots["seq"][0] = 5  # writer died between the two seq stores
+    with pytest.raises(RuntimeError):
+        read_consistent(slots, retries=3)
+    publish(slots, 0, reading())  # a restarted writer still marks the row odd, then even
+    assert slots["seq"][0] == 6
+    slots["seq"][1] = 0xFFFFFFFF
+    release_rows(slots, [1])
+    assert read_consistent(slots)["seq"].tolist() == [6, 0]
+
+
+def test_dead_worker_is_restarted_and_its_rows_released(simulator):
+    port = simulator.add(SimulatedModule(module_id=3, sht40_time=0.001))
+    with ShardedFleet([DeviceSchedule(port, sht40_interval=0.05)], workers=1, supervise_interval=0.05) as fleet:
+        wait_until(lambda: port in fleet.latest())
+        pid = fleet.worker_stats()[0]["pid"]
+        os.kill(pid, signal.SIGKILL)
+        fleet._slots["seq"][0] |= 1  # as if it died mid-publish
+        wait_until(lambda: fleet.worker_stats()[0]["restarts"] == 1)
+        readings = fleet.table()["readings"][0]
+        wait_until(lambda: fleet.table()["readings"][0] > readings)
+        assert fleet.latest()[port]["module_id"] == 3
+        assert fleet.worker_stats()[0]["pid"] != pid
@@ -0,0 +1,44 @@
+from client import build_empty_read_frame, build_registers_read_frame, build_registers_write_frame
+from module import CONTROL_SHT40_MEASUREMENT_SET
+from protocol import ACK, NACK, READY, FRAME_OP_POS, process_frame
+from registers import Registers
+from simulator import NACK_BAD_CRC, NACK_BAD_RANGE, SimulatedModule, split_requests
+
+
+def test_read_write_and_measurement_completion():
+    module = SimulatedModule(module_id=0x01020304, sht40_time=0.5)
+    response = module.handle(bytes(build_registers_read_frame(0x7C, 4)), now=0.0)
+    assert bytes(process_frame(response)) == bytes([4, 3, 2, 1])
+    write = bytes(build_registers_write_frame(Registers.REG_CONTROL, [CONTROL_SHT40_MEASUREMENT_SET]))
+    assert module.handle(write, now=1.0)[FRAME_OP_POS] == ACK
+    module.update(1.4)
+    assert module.registers[Registers.REG_CONTROL] == CONTROL_SHT40_MEASUREMENT_SET
+    module.update(1.5)
+    assert module.registers[Registers.REG_CONTROL] == 0
+
+
+def test_nacks():
+    module = SimulatedModule()
+    frame = bytearray(build_registers_read_frame(0, 4))
+    frame[-3] ^= 0xFF
+    response = module.handle(bytes(frame), now=0.0)
+    assert response[FRAME_OP_POS] == NACK and response[2] == NACK_BAD_CRC
+    response = module.handle(bytes(build_registers_read_frame(0xFE, 4)), now=0.0)
+    assert response[FRAME_OP_POS] == NACK and response[2] == NACK_BAD_RANGE
+
+
+def test_sleeping_module_answers_ready_without_executing():
+    module = SimulatedModule(sleep_timeout=0.5)
+    write = bytes(build_registers_write_frame(Registers.REG_CONTROL, [CONTROL_SHT40_MEASUREMENT_SET]))
+    assert module.handle(write, now=0.0)[FRAME_OP_POS] == READY
+    assert module.registers[Registers.REG_CONTROL] == 0
+    assert module.handle(write, now=0.1)[FRAME_OP_POS] == ACK
+    assert module.handle(bytes(build_empty_read_frame()), now=1.0)[FRAME_OP_POS] == READY
+
+
+def test_split_requests_keeps_partial_frame():
+    read = bytes(build_registers_read_frame(0, 4))
+    write = bytes(build_registers_write_frame(4, [1]))
+    buf = bytearray(b"\x00" + read + write + write[:4])
+    assert split_requests(buf) == [read, write]
+    assert buf == write[:4]
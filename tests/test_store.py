@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import numpy as np
+
+from logger import CsvLogger
+from module import Module
+from store import HEADER_SIZE, RECORD, BinaryStore, chunk_paths, convert_csv_logs, read_chunk, read_store
+
+
+def fill(store_dir, n, chunk_records=4):
+    with BinaryStore(store_dir, chunk_records=chunk_records) as store:
+        for i in range(n):
+            store.append(1000.0 + i, i, 0, 0, 20.9, 22.0, 45.0)
+
+
+def test_roundtrip_across_chunks_and_range(tmp_path):
+    fill(tmp_path, 10)
+    assert len(chunk_paths(tmp_path)) == 3
+    records = read_store(tmp_path)
+    assert list(records["module_id"]) == list(range(10))
+    assert records["concentration"][0] == np.float32(20.9)
+    assert list(read_store(tmp_path, start=1003, end=1006)["module_id"]) == [3, 4, 5]
+
+
+def test_log_takes_module_and_datetime(tmp_path):
+    module = Module()
+    module.module_id = 5
+    module.humidity = 33.3
+    ts = datetime(2026, 1, 1, 12, 0, 0)
+    with BinaryStore(tmp_path) as store:
+        store.log(module, ts)
+    (record,) = read_store(tmp_path)
+    assert record["timestamp"] == ts.timestamp() and record["module_id"] == 5
+    assert record["humidity"] == np.float32(module.humidity)
+
+
+def test_truncated_tail_is_ignored_and_repaired(tmp_path):
+    fill(tmp_path, 3)
+    path = chunk_paths(tmp_path)[-1]
+    with path.open("ab") as f:
+        f.write(b"\x01" * (RECORD.size // 2))
+    assert len(read_chunk(path)) == 3
+    fill(tmp_path, 1)  # reopening drops the partial record before appending
+    assert path.stat().st_size == HEADER_SIZE + 4 * RECORD.size
+
+
+def test_chunk_shorter_than_header(tmp_path):
+    fill(tmp_path, 2)
+    (tmp_path / "chunk-000002.fts").write_bytes(b"FOX")
+    assert len(read_chunk(tmp_path / "chunk-000002.fts")) == 0
+    assert len(read_store(tmp_path)) == 2
+
+
+def test_convert_reads_segments_and_skips_converted_rows(tmp_path):
+    logs, store_dir = tmp_path / "logs", tmp_path / "store"
+    module = Module()
+
+    def log(compression, hours):
+        with CsvLogger(logs, compression=compression) as logger:
+            for hour in hours:
+                module.module_id = hour
+                logger.log(module, datetime(2026, 1, 1, hour))
+
+    log(None, [0, 1])
+    log("gzip", [2, 3])
+    assert convert_csv_logs(logs, store_dir) == 4
+    assert convert_csv_logs(logs, store_dir) == 0
+    log("gzip", [4])
+    assert convert_csv_logs(logs, store_dir) == 1
+    assert list(read_store(store_dir)["module_id"]) == [0, 1, 2, 3, 4]
@@ -0,0 +1,63 @@
+import json
+import time
+from datetime import datetime
+
+import tracing
+from connection import Connection
+from logger import CsvLogger
+from module import CONTROL_SHT40_MEASUREMENT_SET, Module
+from simulator import SimulatedModule
+
+
+def test_open_connection_follows_start_and_stop(simulator, tmp_path):
+    port = simulator.add(SimulatedModule())
+    with Connection(port) as conn:
+        conn.ping(force=True)  # before tracing: nothing recorded
+        first = tracing.start()
+        try:
+            conn.ping(force=True)
+            second = tracing.start()  # replaces the running tracer
+            assert conn.read_registers(0x00, 4) is not None
+        finally:
+            assert tracing.stop(tmp_path / "run.json") is second
+        conn.ping(force=True)
+    assert [e[1] for e in first._events] == ["write", "receive", "ping"]
+    names = [e["name"] for e in json.loads((tmp_path / "run.json").read_text())["traceEvents"] if e["ph"] == "X"]
+    assert names == ["write", "receive", "decode"]
+
+
+def test_resent_request_is_marked_on_its_spans(simulator):
+    module = SimulatedModule(sleep_timeout=0.05)
+    port = simulator.add(module)
+    with Connection(port, sleep_timeout=10.0) as conn:
+        assert conn.ping(force=True)
+        time.sleep(0.1)  # asleep again, answers READY
+        tracer = tracing.start()
+        try:
+            assert conn.write_registers(0x04, [CONTROL_SHT40_MEASUREMENT_SET])
+        finally:
+            tracing.stop()
+    args = [(e[1], e[4]) for e in tracer._events]
+    assert [(name, a["retry"], a.get("reason")) for name, a in args] == [
+        ("write", 0, None), ("receive", 0, None), ("write", 1, "asleep"), ("receive", 1, "asleep")]
+    assert all(a["reconnect"] == 0 for _, a in args)
+
+
+def test_explicit_tracer_and_logger(tmp_path):
+    own = tracing.Tracer()
+    assert Connection("unused", tracer=own).tracer is own
+    with CsvLogger(tmp_path) as logger:
+        tracer = tracing.start()
+        try:
+            logger.log(Module(), datetime(2026, 1, 1))
+            logger.close()
+        finally:
+            tracing.stop()
+    assert [(e[1], e[4]) for e in tracer._events] == [("log_write", {"rows": 1})]
+
+
+def test_event_limit_counts_dropped():
+    tracer = tracing.Tracer(max_events=2)
+    for i in range(5):
+        tracer.complete("port", "span", i, i + 1)
+    assert len(tracer.events()) == 3 and tracer.dropped == 3  # metadata + 2 spans
@@ -0,0 +1,93 @@
+import copy
+
+import pytest
+
+import module as module_mod
+from connection import Connection
+from module import Module, CONTROL_SHT40_MEASUREMENT_SET
+from registers import REGISTERS_PAGE_SIZE, Registers
+from simulator import SimulatedModule
+from writes import WRITE_MERGE_GAP, WriteQueue, flush_writes
+
+
+def read_module(page=None):
+    module = Module()
+    module.deserialize(page or bytes(range(REGISTERS_PAGE_SIZE)))
+    return module
+
+
+def test_no_op_writes_are_dropped_except_volatile():
+    module = read_module()
+    module.stage_registers(0x02, bytes([2, 3]))  # firmware version: same as read
+    assert module.dirty_writes() == []
+    assert not module.has_staged_writes
+    module.stage("control", module.control)  # volatile: always written
+    assert module.dirty_writes() == [(Registers.REG_CONTROL, bytes([Registers.REG_CONTROL]))]
+
+
+def test_adjacent_runs_merge():
+    module = Module()
+    module.stage_registers(0x20, b"\x01\x02")
+    module.stage_registers(0x22, b"\x03")
+    module.stage_registers(0x30, b"\x04")
+    assert module.dirty_writes() == [(0x20, b"\x01\x02\x03"), (0x30, b"\x04")]
+
+
+def test_gaps_are_never_filled_with_read_only_or_unmapped_registers():
+    module = read_module()
+    # control (0x04) and the device id (0x7C) after a full read: the bytes between
+    # are versions, status, sensor values and unmapped registers
+    module.stage("control", CONTROL_SHT40_MEASUREMENT_SET)
+    module.stage_registers(0x7C, b"\x00\x00\x00\x01")
+    module.stage_registers(0x14, b"\xAA")
+    writes = module.dirty_writes(merge_gap=REGISTERS_PAGE_SIZE)
+    assert writes == [(0x04, bytes([CONTROL_SHT40_MEASUREMENT_SET])), (0x14, b"\xAA"), (0x7C, b"\x00\x00\x00\x01")]
+    assert WRITE_MERGE_GAP < REGISTERS_PAGE_SIZE
+
+
+def test_gap_of_known_writable_registers_is_joined(monkeypatch):
+    writable = bytearray(REGISTERS_PAGE_SIZE)
+    writable[0x20:0x30] = b"\x01" * 16
+    monkeypatch.setattr(module_mod, "_WRITABLE", writable)
+    module = read_module()
+    module.stage_registers(0x20, b"\xF0")
+    module.stage_registers(0x24, b"\xF4")
+    assert module.dirty_writes(merge_gap=3) == [(0x20, bytes([0xF0, 0x21, 0x22, 0x23, 0xF4]))]
+    assert module.dirty_writes(merge_gap=2) == [(0x20, b"\xF0"), (0x24, b"\xF4")]
+    # Registers never read are unknown and are not rewritten either
+    fresh = Module()
+    fresh.stage_registers(0x20, b"\xF0")
+    fresh.stage_registers(0x24, b"\xF4")
+    assert fresh.dirty_writes(merge_gap=3) == [(0x20, b"\xF0"), (0x24, b"\xF4")]
+
+
+def test_stage_outside_page_raises():
+    with pytest.raises(ValueError):
+        Module().stage_registers(REGISTERS_PAGE_SIZE - 1, b"\x00\x00")
+
+
+def test_copy_has_its_own_shadow():
+    live = read_module()
+    snapshot = copy.copy(live)
+    live.stage("control", CONTROL_SHT40_MEASUREMENT_SET)
+    live.deserialize(bytes(REGISTERS_PAGE_SIZE))
+    assert live.has_staged_writes and not snapshot.has_staged_writes
+    assert snapshot.module_id == read_module().module_id != live.module_id
+    assert snapshot.dirty_writes() == []
+
+
+def test_flush_against_device(simulator):
+    device = SimulatedModule(sht40_time=5.0)
+    port = simulator.add(device)
+    queue = WriteQueue()
+    module = Module()
+    with Connection(port) as conn:
+        assert conn.ping()
+        module.deserialize(conn.read_registers())
+        queue.stage_registers(conn, module, 0x20, b"\x01\x02")
+        queue.stage(conn, module, "control", CONTROL_SHT40_MEASUREMENT_SET)
+        assert queue.flush() == {port: 2}
+        assert flush_writes(conn, module) == 0
+    assert device.registers[0x20:0x22] == b"\x01\x02"
+    assert device.registers[Registers.REG_CONTROL] == CONTROL_SHT40_MEASUREMENT_SET
+    assert not module.has_staged_writes
@@ -0,0 +1,84 @@
+"""Opt-in Chrome trace (Perfetto) timeline of bus and acquisition work.
+
+Start tracing, run, then save; open the file in https://ui.perfetto.dev or
+chrome://tracing::
+
+    tracing.start()
+    cli_app(port)
+    tracing.stop("acquisition.trace.json")
+
+Every serial port gets its own track with ping, write, receive, decode and
+measurement wait spans (args: op code, frame length, retry); a resent request
+also carries the reason, "asleep" (answered READY) or "timeout". CSV writes
+have a track of their own. Connections and loggers look up ``TRACER`` whenever they
+record, so tracing can be started and stopped around already open ones. With
+tracing off nothing is recorded.
+"""
+import json
+import os
+import threading
+import time
+
+TRACER = None
+
+
+class Tracer:
+    """Collects complete ("X") events in memory; ``save()`` writes the Chrome trace JSON."""
+
+    def __init__(self, max_events=1_000_000):
+        self.max_events = max_events
+        self.dropped = 0
+        self._events = []
+        self._tracks = {}
+        self._lock = threading.Lock()
+        self._start_ns = time.perf_counter_ns()
+
+    def track(self, name):
+        """Track id for ``name`` (a port or other lane); created on first use."""
+        tid = self._tracks.get(name)
+        if tid is None:
+            with self._lock:
+                tid = self._tracks.setdefault(name, len(self._tracks) + 1)
+        return tid
+
+    def complete(self, track, name, start_ns, end_ns, args=None):
+        """Record span ``name`` on ``track`` from ``start_ns`` to ``end_ns`` (perf_counter_ns)."""
+        if len(self._events) >= self.max_events:
+            self.dropped += 1
+            return
+        self._events.append((self.track(track), name, start_ns, end_ns, args))
+
+    def events(self):
+        pid = os.getpid()
+        events = [
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": str(name)}}
+            for name, tid in self._tracks.items()
+        ]
+        start = self._start_ns
+        for tid, name, start_ns, end_ns, args in list(self._events):
+            event = {"ph": "X", "name": name, "pid": pid, "tid": tid,
+                     "ts": (start_ns - start) / 1e3, "dur": (end_ns - start_ns) / 1e3}
+            if args:
+                event["args"] = args
+            events.append(event)
+        return events
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f)
+
+
+def start(max_events=1_000_000):
+    """Enable tracing with a new Tracer, replacing any running one."""
+    global TRACER
+    TRACER = Tracer(max_events)
+    return TRACER
+
+
+def stop(path=None):
+    """Disable tracing; write the timeline to ``path`` when given. Return the tracer."""
+    global TRACER
+    tracer, TRACER = TRACER, None
+    if tracer is not None and path:
+        tracer.save(path)
+    return tracer
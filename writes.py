@@ -0,0 +1,66 @@
+"""Batched register writes.
+
+Configuration changes are staged on the Module (``module.stage("field", value)``
+or ``module.stage_registers(address, data)``) instead of being written one by
+one. A flush sends the staged registers in as few OPERATION_WRITE frames as
+possible and skips values the module already holds::
+
+    queue = WriteQueue()
+    for conn, module in fleet:
+        queue.stage(conn, module, "some_setting", 3)
+    queue.flush()
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from client import READ_MERGE_GAP
+
+# Rewriting a few known register bytes between two staged runs costs less wire
+# time than the extra round trip of a second frame, as for reads. Only writable
+# registers are ever rewritten (see Module.dirty_writes).
+WRITE_MERGE_GAP = READ_MERGE_GAP
+
+
+def flush_writes(conn, module, merge_gap=WRITE_MERGE_GAP):
+    """Write the registers staged on ``module``; return the number of frames sent, None if a write failed."""
+    frames = 0
+    for address, data in module.dirty_writes(merge_gap):
+        if not conn.write_registers(address, data):
+            print(f"ERROR: Write registers 0x{address:02X}+{len(data)} failed on {conn.port}")
+            return None
+        module.mark_written(address, data)
+        frames += 1
+    return frames
+
+
+class WriteQueue:
+    """Staged writes for many modules, flushed together with one thread per port."""
+
+    def __init__(self, merge_gap=WRITE_MERGE_GAP, max_workers=8):
+        self.merge_gap = merge_gap
+        self.max_workers = max_workers
+        self._targets = {}  # port -> (conn, module)
+
+    def stage(self, conn, module, name, value):
+        module.stage(name, value)
+        self._targets[conn.port] = (conn, module)
+
+    def stage_registers(self, conn, module, address, data):
+        module.stage_registers(address, data)
+        self._targets[conn.port] = (conn, module)
+
+    def flush(self):
+        """Flush every staged module; return {port: frames sent, or None on failure}."""
+        targets, self._targets = self._targets, {}
+        if not targets:
+            return {}
+        with ThreadPoolExecutor(min(self.max_workers, len(targets))) as pool:
+            results = {
+                port: pool.submit(flush_writes, conn, module, self.merge_gap)
+                for port, (conn, module) in targets.items()
+            }
+        frames = {port: result.result() for port, result in results.items()}
+        for port, sent in frames.items():
+            if sent is None:
+                # Keep failed modules queued; their registers are still staged
+                self._targets.setdefault(port, targets[port])
+        return frames